@@ -4,13 +4,56 @@ import io
 import tkinter as tk
 from tkinter import ttk, scrolledtext, messagebox, Menu, font
 import threading
-import mss
-import numpy as np
-from PIL import Image, ImageTk
-import pytesseract
-import cv2
+import asyncio
+import time
+import random
+import re
+import queue
+import hashlib
+import sqlite3
+from collections import Counter, OrderedDict, deque
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import configparser
-from openai import OpenAI
+import argparse
+import glob
+import json
+import importlib
+import importlib.util
+import subprocess
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class LazyModule:
+    """首次访问属性时才导入的模块代理，把重型模块的导入推迟到真正用到（或后台预热）时"""
+
+    def __init__(self, name):
+        self.module_name = name
+        self._module = None
+
+    def load(self):
+        if self._module is None:
+            self._module = importlib.import_module(self.module_name)
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self.load(), attr)
+
+
+# 图像、OCR 和 API 相关的重型模块（延迟导入，窗口先显示）
+mss = LazyModule("mss")
+np = LazyModule("numpy")
+Image = LazyModule("PIL.Image")
+ImageTk = LazyModule("PIL.ImageTk")
+pytesseract = LazyModule("pytesseract")
+cv2 = LazyModule("cv2")
+openai = LazyModule("openai")
+
+# 可选：tesserocr 进程内绑定（常驻引擎，无需每次启动 tesseract 进程）
+tesserocr = LazyModule("tesserocr") if importlib.util.find_spec("tesserocr") else None
+
+# 启动时在后台预热的模块
+WARM_UP_MODULES = (np, cv2, Image, ImageTk, mss, openai)
 
 # ==================== 强制 UTF-8 ====================
 os.environ['PYTHONIOENCODING'] = 'utf-8'
@@ -35,6 +78,85 @@ PRE_PROMPT = config.get('Settings', 'pre_prompt', fallback='将下面的文本
 SYSTEM_PROMPT = config.get('Settings', 'system_prompt', fallback='你是一个翻译助手。')
 TEMPERATURE = float(config.get('Settings', 'temperature', fallback='1.0'))
 CONTEXT_NUM = int(config.get('Settings', 'context_num', fallback='5'))
+CONTEXT_MAX_TOKENS = int(config.get('Settings', 'context_max_tokens', fallback='1500'))
+# OCR 并行执行设置
+OCR_MAX_WORKERS = int(config.get('Settings', 'ocr_max_workers', fallback='5'))
+OCR_QUALITY_THRESHOLD = float(config.get('Settings', 'ocr_quality_threshold', fallback='0.9'))
+OCR_MIN_CHARS = int(config.get('Settings', 'ocr_min_chars', fallback='4'))
+# 平均单词置信度（0-100）达到该值即停止尝试其余 OCR 方案
+OCR_CONFIDENCE_THRESHOLD = float(config.get('Settings', 'ocr_confidence_threshold', fallback='80'))
+# OCR 后端: auto（优先 tesserocr）/ tesserocr / pytesseract
+OCR_BACKEND = config.get('Settings', 'ocr_backend', fallback='auto').strip().lower()
+# 识别前把文字缩放到该 x 高度（像素），0 表示不缩放
+OCR_TARGET_X_HEIGHT = int(config.get('Settings', 'ocr_target_x_height', fallback='20'))
+# 固定颜色的字幕：按颜色提取文字（如 #FFFFFF），留空不启用
+OCR_TEXT_COLOR = config.get('Settings', 'ocr_text_color', fallback='').strip()
+OCR_COLOR_TOLERANCE = int(config.get('Settings', 'ocr_color_tolerance', fallback='40'))
+# 先定位文字行，只对文字行裁剪图逐行识别；检测到的行数超过上限时退回整图识别
+OCR_LINE_DETECTION = config.getboolean('Settings', 'ocr_line_detection', fallback=True)
+OCR_MAX_LINES = int(config.get('Settings', 'ocr_max_lines', fallback='24'))
+# OCR 配置档：按游戏记录各方案胜率和耗时，优先尝试历史最佳方案
+OCR_PROFILE = config.get('Settings', 'ocr_profile', fallback='default').strip() or 'default'
+OCR_PROFILE_PATH = config.get('Settings', 'ocr_profile_path', fallback='ocr_profiles.json')
+# 运行这么多次仍从未胜出的方案不再尝试
+OCR_PROFILE_PRUNE_RUNS = int(config.get('Settings', 'ocr_profile_prune_runs', fallback='20'))
+# 翻译缓存设置
+CACHE_PATH = config.get('Settings', 'cache_path', fallback='translation_cache.db')
+CACHE_MEMORY_SIZE = int(config.get('Settings', 'cache_memory_size', fallback='512'))
+CACHE_MAX_ENTRIES = int(config.get('Settings', 'cache_max_entries', fallback='20000'))
+CACHE_MAX_AGE_DAYS = float(config.get('Settings', 'cache_max_age_days', fallback='30'))
+# 模糊翻译记忆：OCR 噪声导致的近似原文直接复用已有译文
+TRANSLATION_MEMORY = config.getboolean('Settings', 'translation_memory', fallback=True)
+TM_THRESHOLD = float(config.get('Settings', 'tm_threshold', fallback='0.92'))
+# 相似度介于两者之间时先显示相似原文的译文作为临时结果，同时请求准确翻译
+TM_PROVISIONAL_THRESHOLD = float(config.get('Settings', 'tm_provisional_threshold', fallback='0.8'))
+# 超过此长度（字符）的原文不做模糊匹配
+TM_MAX_LENGTH = int(config.get('Settings', 'tm_max_length', fallback='200'))
+# 流式输出设置
+STREAM_OUTPUT = config.getboolean('Settings', 'stream_output', fallback=True)
+STREAM_FLUSH_MS = int(config.get('Settings', 'stream_flush_ms', fallback='50'))
+# 截图识别流水线：各级之间的队列长度，以及界面取结果的间隔
+PIPELINE_QUEUE_SIZE = int(config.get('Settings', 'pipeline_queue_size', fallback='2'))
+PIPELINE_PUMP_MS = int(config.get('Settings', 'pipeline_pump_ms', fallback='30'))
+# 选区覆盖窗口：拖动重绘频率；可选显示冻结截图（按整数倍缩小后转换一次）
+OVERLAY_REFRESH_HZ = int(config.get('Settings', 'overlay_refresh_hz', fallback='60'))
+OVERLAY_SHOW_FROZEN = config.getboolean('Settings', 'overlay_show_frozen', fallback=False)
+OVERLAY_FROZEN_DOWNSCALE = int(config.get('Settings', 'overlay_frozen_downscale', fallback='2'))
+# 保存的截图区域（名称、屏幕坐标、热键、可选的 OCR 配置档）
+REGIONS_PATH = config.get('Settings', 'regions_path', fallback='regions.json')
+# 区域监视设置
+WATCH_INTERVAL_MS = int(config.get('Settings', 'watch_interval_ms', fallback='500'))
+WATCH_DIFF_THRESHOLD = float(config.get('Settings', 'watch_diff_threshold', fallback='4.0'))
+# 批量翻译设置：调度队列中等待的短文本最多等待窗口时间，合并为一次请求（窗口为 0 表示不合并请求）；
+# 开启 cancel_stale_requests 时同等优先级的请求不会重叠，最多只有一个手动和一个后台请求，不使用批量
+BATCH_WINDOW_MS = int(config.get('Settings', 'batch_window_ms', fallback='100'))
+BATCH_MAX_SEGMENTS = int(config.get('Settings', 'batch_max_segments', fallback='8'))
+# 长文本分块：原文超过 chunk_max_tokens 时按段落/句子切分后并发翻译（0 表示不分块）
+CHUNK_MAX_TOKENS = int(config.get('Settings', 'chunk_max_tokens', fallback='300'))
+CHUNK_CONCURRENCY = int(config.get('Settings', 'chunk_concurrency', fallback='4'))
+# 译文 max_tokens 按原文估算，不超过此上限
+COMPLETION_MAX_TOKENS = int(config.get('Settings', 'completion_max_tokens', fallback='1024'))
+# 翻译调度设置
+MAX_CONCURRENT_REQUESTS = int(config.get('Settings', 'max_concurrent_requests', fallback='2'))
+CANCEL_STALE_REQUESTS = config.getboolean('Settings', 'cancel_stale_requests', fallback=True)
+# 等待发送的请求上限，超出时丢弃最旧的后台请求
+TRANSLATION_QUEUE_SIZE = int(config.get('Settings', 'translation_queue_size', fallback='8'))
+# 客户端限流（每分钟请求数 / token 数，0 表示不限制）与失败重试
+API_RPM = int(config.get('Settings', 'api_rpm', fallback='60'))
+API_TPM = int(config.get('Settings', 'api_tpm', fallback='100000'))
+API_MAX_RETRIES = int(config.get('Settings', 'api_max_retries', fallback='3'))
+API_BACKOFF_BASE_MS = int(config.get('Settings', 'api_backoff_base_ms', fallback='500'))
+API_BACKOFF_MAX_S = float(config.get('Settings', 'api_backoff_max_s', fallback='20'))
+# 多端点：超过滚动 p95 延迟仍未返回时向备用端点发送对冲请求，先返回者胜出
+REQUEST_TIMEOUT = float(config.get('Settings', 'request_timeout', fallback='30'))
+HEDGE_REQUESTS = config.getboolean('Settings', 'hedge_requests', fallback=True)
+HEDGE_MIN_DELAY_MS = int(config.get('Settings', 'hedge_min_delay_ms', fallback='1500'))
+ENDPOINT_FAILURE_THRESHOLD = int(config.get('Settings', 'endpoint_failure_threshold', fallback='3'))
+ENDPOINT_COOLDOWN_S = float(config.get('Settings', 'endpoint_cooldown_s', fallback='60'))
+# 性能追踪设置（trace_file 为空则不导出，metrics_port 为 0 则不启动指标接口）
+TRACE_FILE = config.get('Settings', 'trace_file', fallback='').strip()
+TRACE_WINDOW = int(config.get('Settings', 'trace_window', fallback='200'))
+METRICS_PORT = int(config.get('Settings', 'metrics_port', fallback='0'))
 
 # ==================== 主题颜色定义 ====================
 THEMES = {
@@ -101,40 +223,2550 @@ TESSERACT_EXE_PATH = r"E:\Tesseract OCR\tesseract.exe"
 # 设置 Tesseract OCR 数据目录路径
 TESSDATA_PREFIX = r"E:\Tesseract OCR\tessdata"
 
-# 检查并设置 Tesseract OCR 路径
-if os.path.exists(TESSERACT_EXE_PATH):
-    pytesseract.pytesseract.tesseract_cmd = TESSERACT_EXE_PATH
-    print(f"✅ 已设置 Tesseract OCR 可执行文件路径: {TESSERACT_EXE_PATH}")
-else:
-    print(f"⚠️  警告: Tesseract OCR 可执行文件路径不存在: {TESSERACT_EXE_PATH}")
-
-# 检查并设置 TESSDATA_PREFIX 环境变量
-if os.path.exists(TESSDATA_PREFIX):
-    # 设置环境变量，让 Tesseract 知道语言数据的位置
-    os.environ['TESSDATA_PREFIX'] = TESSDATA_PREFIX
-    print(f"✅ 已设置 TESSDATA_PREFIX 环境变量: {TESSDATA_PREFIX}")
-
-    # 检查语言数据文件是否存在
-    eng_traineddata = os.path.join(TESSDATA_PREFIX, "eng.traineddata")
-    if os.path.exists(eng_traineddata):
-        print(f"✅ 找到英文语言数据文件: {eng_traineddata}")
-    else:
-        print(f"⚠️  警告: 未找到英文语言数据文件 eng.traineddata")
-else:
-    print(f"⚠️  警告: TESSDATA_PREFIX 路径不存在: {TESSDATA_PREFIX}")
-
-# ✅ 关键检查：API Key 是否为空
-if not API_KEY:
-    print("❌ 错误：config.ini 中的 api_key 为空！")
-    print("请前往 https://platform.deepseek.com/ 获取 API Key 并填入 config.ini")
-    input("按回车退出...")
-    sys.exit(1)
+_tesseract_configured = False
+_tesseract_lock = threading.Lock()
+
+
+def configure_tesseract():
+    """检查并设置 Tesseract OCR 路径（只执行一次，首次使用 OCR 或后台预热时调用）"""
+    global _tesseract_configured
+    with _tesseract_lock:
+        if _tesseract_configured:
+            return
+        _tesseract_configured = True
+
+        if os.path.exists(TESSERACT_EXE_PATH):
+            pytesseract.pytesseract.tesseract_cmd = TESSERACT_EXE_PATH
+            print(f"✅ 已设置 Tesseract OCR 可执行文件路径: {TESSERACT_EXE_PATH}")
+        else:
+            print(f"⚠️  警告: Tesseract OCR 可执行文件路径不存在: {TESSERACT_EXE_PATH}")
+
+        # 检查并设置 TESSDATA_PREFIX 环境变量
+        if os.path.exists(TESSDATA_PREFIX):
+            # 设置环境变量，让 Tesseract 知道语言数据的位置
+            os.environ['TESSDATA_PREFIX'] = TESSDATA_PREFIX
+            print(f"✅ 已设置 TESSDATA_PREFIX 环境变量: {TESSDATA_PREFIX}")
+
+            # 检查语言数据文件是否存在
+            eng_traineddata = os.path.join(TESSDATA_PREFIX, "eng.traineddata")
+            if os.path.exists(eng_traineddata):
+                print(f"✅ 找到英文语言数据文件: {eng_traineddata}")
+            else:
+                print(f"⚠️  警告: 未找到英文语言数据文件 eng.traineddata")
+        else:
+            print(f"⚠️  警告: TESSDATA_PREFIX 路径不存在: {TESSDATA_PREFIX}")
+
+
+# ==================== OCR 引擎后端 ====================
+def parse_tesseract_config(config_str):
+    """从 Tesseract 命令行配置中解析 (语言, psm, oem)"""
+    lang = re.search(r'-l\s+(\S+)', config_str)
+    psm = re.search(r'--psm\s+(\d+)', config_str)
+    oem = re.search(r'--oem\s+(\d+)', config_str)
+    return (lang.group(1) if lang else 'eng',
+            int(psm.group(1)) if psm else 3,
+            int(oem.group(1)) if oem else 3)
+
+
+class PytesseractBackend:
+    """兼容后端：每次调用启动一个 tesseract 进程（经由临时图像文件）"""
+    name = "pytesseract"
+
+    def image_to_data(self, image, config_str):
+        """识别文字，返回 (文本, 平均单词置信度 0-100)"""
+        configure_tesseract()
+        data = pytesseract.image_to_data(image, config=config_str, output_type=pytesseract.Output.DICT)
+        lines = OrderedDict()
+        confidences = []
+        for i, word in enumerate(data["text"]):
+            conf = float(data["conf"][i])
+            if not word.strip() or conf < 0:
+                continue
+            key = (data["block_num"][i], data["par_num"][i], data["line_num"][i])
+            lines.setdefault(key, []).append(word)
+            confidences.append(conf)
+        text = '\n'.join(' '.join(words) for words in lines.values())
+        confidence = sum(confidences) / len(confidences) if confidences else 0.0
+        return text, confidence
+
+    def version(self):
+        configure_tesseract()
+        return pytesseract.get_tesseract_version()
+
+    def close(self):
+        pass
+
+
+class TesserocrBackend:
+    """常驻后端：按语言缓存 tesserocr 引擎实例，语言模型只加载一次，直接读取 numpy 内存"""
+    name = "tesserocr"
+
+    def __init__(self, tessdata_path=None):
+        self.tessdata_path = tessdata_path
+        self._idle_apis = {}  # (lang, oem) -> 空闲引擎列表
+        self._all_apis = []
+        self._lock = threading.Lock()
+
+    def _acquire(self, lang, oem):
+        """取出一个空闲引擎，没有则新建（新建时加载语言模型）"""
+        key = (lang, oem)
+        with self._lock:
+            idle = self._idle_apis.setdefault(key, [])
+            if idle:
+                return idle.pop()
+        kwargs = {"lang": lang, "oem": oem}
+        if self.tessdata_path:
+            kwargs["path"] = self.tessdata_path
+        api = tesserocr.PyTessBaseAPI(**kwargs)
+        with self._lock:
+            self._all_apis.append(api)
+        return api
+
+    def _release(self, lang, oem, api):
+        with self._lock:
+            self._idle_apis.setdefault((lang, oem), []).append(api)
+
+    def image_to_data(self, image, config_str):
+        """识别文字，返回 (文本, 平均单词置信度 0-100)"""
+        lang, psm, oem = parse_tesseract_config(config_str)
+        img = np.ascontiguousarray(image)
+        height, width = img.shape[:2]
+        bytes_per_pixel = 1 if img.ndim == 2 else img.shape[2]
+
+        api = self._acquire(lang, oem)
+        try:
+            api.SetPageSegMode(psm)
+            api.SetImageBytes(img.tobytes(), width, height, bytes_per_pixel, img.strides[0])
+            text = api.GetUTF8Text()
+            return text, float(api.MeanTextConf())
+        finally:
+            api.Clear()
+            self._release(lang, oem, api)
+
+    def version(self):
+        return tesserocr.tesseract_version().splitlines()[0]
+
+    def close(self):
+        with self._lock:
+            for api in self._all_apis:
+                api.End()
+            self._all_apis.clear()
+            self._idle_apis.clear()
+
+
+def create_ocr_backend(preference=OCR_BACKEND):
+    """根据配置创建 OCR 后端，tesserocr 不可用时回退到 pytesseract"""
+    if preference in ("auto", "tesserocr") and tesserocr is not None:
+        tessdata_path = TESSDATA_PREFIX if os.path.exists(TESSDATA_PREFIX) else None
+        print("✅ 使用 tesserocr 常驻 OCR 引擎")
+        return TesserocrBackend(tessdata_path)
+    if preference == "tesserocr":
+        print("⚠️  警告: 未安装 tesserocr，回退到 pytesseract")
+    return PytesseractBackend()
+
+
+# ==================== 图像预处理 ====================
+def parse_hex_color(value):
+    """'#RRGGBB' -> (R, G, B)"""
+    value = value.lstrip('#')
+    if len(value) != 6:
+        raise ValueError(f"颜色格式应为 #RRGGBB: {value}")
+    return tuple(int(value[i:i + 2], 16) for i in (0, 2, 4))
+
+
+def estimate_x_height(gray):
+    """估算文字高度：取二值图中字符大小连通域高度的中位数，无法估算时返回 None"""
+    step = 2 if gray.size > 2000000 else 1
+    sample = np.ascontiguousarray(gray[::step, ::step]) if step > 1 else gray
+    _, binary = cv2.threshold(sample, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    # 前景（文字）通常是占比较少的一类像素
+    if cv2.countNonZero(binary) > binary.size // 2:
+        cv2.bitwise_not(binary, dst=binary)
+    count, _, stats, _ = cv2.connectedComponentsWithStats(binary, connectivity=8)
+    heights = stats[1:count, cv2.CC_STAT_HEIGHT]
+    widths = stats[1:count, cv2.CC_STAT_WIDTH]
+    max_height = max(4, sample.shape[0] // 2)
+    chars = heights[(heights >= 3) & (heights <= max_height) & (widths <= heights * 3)]
+    if chars.size < 3:
+        return None
+    return float(np.median(chars)) * step
+
+
+class Preprocessor:
+    """图像预处理引擎：按文字高度缩放，从同一个灰度缓冲区一次生成所有二值化变体
+
+    输出缓冲区按尺寸预先分配并复用，返回的图像在下一次 process() 调用前有效，
+    因此每个识别线程应使用自己的实例。
+    """
+
+    def __init__(self, target_x_height=OCR_TARGET_X_HEIGHT, text_color=OCR_TEXT_COLOR,
+                 color_tolerance=OCR_COLOR_TOLERANCE):
+        self.target_x_height = target_x_height
+        self.text_color = parse_hex_color(text_color) if text_color else None
+        self.color_tolerance = color_tolerance
+        self._buffers = {}
+        self._shape = None
+
+    def _buffer(self, name, shape):
+        """取出指定尺寸的复用缓冲区，尺寸变化时重新分配"""
+        if self._shape != shape:
+            self._buffers.clear()
+            self._shape = shape
+        buf = self._buffers.get(name)
+        if buf is None:
+            buf = self._buffers[name] = np.empty(shape, dtype=np.uint8)
+        return buf
+
+    def scale_for(self, gray):
+        """缩放比例：文字过小放大、过大缩小，接近目标时不缩放"""
+        if not self.target_x_height:
+            return 1.0
+        x_height = estimate_x_height(gray)
+        if not x_height:
+            return 1.0
+        scale = min(4.0, max(0.25, self.target_x_height / x_height))
+        return 1.0 if 0.8 <= scale <= 1.25 else scale
+
+    def process(self, image):
+        """返回 {"adaptive", "otsu", "original_gray"[, "color_key"]} 预处理图像"""
+        img = np.asarray(image)
+
+        # 转换为灰度图
+        if img.ndim == 3:
+            gray = cv2.cvtColor(img, cv2.COLOR_RGB2GRAY)
+        else:
+            gray = img
 
+        scale = self.scale_for(gray)
+        if scale != 1.0:
+            height, width = gray.shape[:2]
+            shape = (max(1, int(round(height * scale))), max(1, int(round(width * scale))))
+            interpolation = cv2.INTER_CUBIC if scale > 1 else cv2.INTER_AREA
+            gray = cv2.resize(gray, (shape[1], shape[0]), dst=self._buffer("gray", shape),
+                              interpolation=interpolation)
+        shape = gray.shape[:2]
+
+        # 方法1: 自适应阈值；方法2: 大津二值化；各自去噪
+        raw = self._buffer("raw", shape)
+        adaptive = self._buffer("adaptive", shape)
+        cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2, dst=raw)
+        cv2.medianBlur(raw, 3, dst=adaptive)
+        otsu = self._buffer("otsu", shape)
+        cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU, dst=raw)
+        cv2.medianBlur(raw, 3, dst=otsu)
+
+        processed = {
+            "adaptive": adaptive,
+            "otsu": otsu,
+            "original_gray": gray
+        }
 
+        if self.text_color is not None and img.ndim == 3:
+            # 按字幕颜色提取：命中颜色的像素为黑字，其余为白底
+            lower = np.array([max(0, c - self.color_tolerance) for c in self.text_color], dtype=np.uint8)
+            upper = np.array([min(255, c + self.color_tolerance) for c in self.text_color], dtype=np.uint8)
+            mask = cv2.inRange(img[:, :, :3], lower, upper)
+            color_key = self._buffer("color_key", shape)
+            if mask.shape[:2] != shape:
+                cv2.resize(mask, (shape[1], shape[0]), dst=color_key, interpolation=cv2.INTER_LINEAR)
+                cv2.threshold(color_key, 127, 255, cv2.THRESH_BINARY_INV, dst=color_key)
+            else:
+                cv2.bitwise_not(mask, dst=color_key)
+            processed["color_key"] = color_key
+
+        return processed
+
+
+# ==================== 文字行定位 ====================
+def detect_text_lines(gray, min_height=8, padding=4):
+    """用形态学梯度 + 横向闭运算在灰度图上定位文字行，返回按阅读顺序排列的 [(x, y, w, h)]
+
+    文字笔画边缘密集，梯度图二值化后横向闭运算会把同一行的字符连成一块；
+    大面积纹理（整张图连成一块）时返回空列表，由调用方退回整图识别。
+    """
+    height, width = gray.shape[:2]
+    gradient = cv2.morphologyEx(gray, cv2.MORPH_GRADIENT,
+                                cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3)))
+    _, binary = cv2.threshold(gradient, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    kernel_width = max(9, min(40, width // 50))
+    connected = cv2.morphologyEx(binary, cv2.MORPH_CLOSE,
+                                 cv2.getStructuringElement(cv2.MORPH_RECT, (kernel_width, 1)))
+    # 用连通域而不是外轮廓：对话框边框不会把框内的文字行“包住”
+    count, _, stats, _ = cv2.connectedComponentsWithStats(connected, connectivity=8)
+
+    boxes = []
+    for x, y, w, h, area in stats[1:count].tolist():
+        if h < min_height or w < min_height // 2:
+            continue
+        # 先排除细线、边框：按连通域自身的像素数计算占比（外接框内的文字不计入）
+        if area < 0.2 * w * h:
+            continue
+        if w * h > 0.8 * width * height:
+            # 实心的大块铺满整张图，说明不是文字行结构
+            return []
+        x0, y0 = max(0, x - padding), max(0, y - padding)
+        x1, y1 = min(width, x + w + padding), min(height, y + h + padding)
+        boxes.append((x0, y0, x1 - x0, y1 - y0))
+
+    # 阅读顺序：按纵向重叠归为同一行，行内从左到右
+    boxes.sort(key=lambda box: box[1])
+    rows = []
+    for box in boxes:
+        row = rows[-1] if rows else None
+        if row is not None:
+            top = max(box[1], min(b[1] for b in row))
+            bottom = min(box[1] + box[3], max(b[1] + b[3] for b in row))
+            if bottom - top > 0.5 * min(box[3], min(b[3] for b in row)):
+                row.append(box)
+                continue
+        rows.append([box])
+    return [box for row in rows for box in sorted(row, key=lambda b: b[0])]
+
+
+def line_config(config_str):
+    """把 Tesseract 配置的页面分割模式改为单行模式（psm 7）"""
+    if re.search(r'--psm\s+\d+', config_str):
+        return re.sub(r'--psm\s+\d+', '--psm 7', config_str)
+    return config_str + ' --psm 7'
+
+
+# ==================== OCR 并行执行器 ====================
+# OCR 方案：(方法名, 预处理图像键, Tesseract 配置)，按预期质量从高到低排列
+# 游戏对话框多为纯色底上的清晰文字，大津二值化通常最干净；自适应阈值在大面积背景上容易产生噪点
+OCR_METHODS = [
+    ("otsu_eng", "otsu", r'--oem 3 --psm 6 -l eng'),
+    ("adaptive_eng", "adaptive", r'--oem 3 --psm 6 -l eng'),
+    ("original_eng", "original_gray", r'--oem 3 --psm 6 -l eng'),
+    # 尝试中文识别（如果有中文语言数据）
+    ("otsu_chi_sim", "otsu", r'--oem 3 --psm 6 -l chi_sim'),
+    ("adaptive_chi_sim", "adaptive", r'--oem 3 --psm 6 -l chi_sim'),
+]
+if OCR_TEXT_COLOR:
+    # 按字幕颜色提取的结果最干净，排在最前
+    OCR_METHODS.insert(0, ("color_key_eng", "color_key", r'--oem 3 --psm 6 -l eng'))
+    OCR_METHODS.append(("color_key_chi_sim", "color_key", r'--oem 3 --psm 6 -l chi_sim'))
+
+# 视为有效的常见标点（中英文）
+OCR_VALID_PUNCT = set(".,!?;:'\"()-…，。！？；：“”‘’（）、《》—")
+
+
+def ocr_text_quality(text):
+    """估算 OCR 结果质量：有效字符（字母、数字、中文、常见标点）所占比例"""
+    if not text:
+        return 0.0
+    valid = sum(1 for ch in text if ch.isalnum() or ch.isspace() or ch in OCR_VALID_PUNCT)
+    return valid / len(text)
+
+
+class OCRExecutor:
+    """按预期质量顺序运行 OCR 方案，以单词置信度评分，置信度达标即提前返回"""
+
+    def __init__(self, backend, max_workers=OCR_MAX_WORKERS, quality_threshold=OCR_QUALITY_THRESHOLD,
+                 min_chars=OCR_MIN_CHARS, confidence_threshold=OCR_CONFIDENCE_THRESHOLD,
+                 line_detection=OCR_LINE_DETECTION, max_lines=OCR_MAX_LINES):
+        self.backend = backend
+        self.quality_threshold = quality_threshold
+        self.min_chars = min_chars
+        self.confidence_threshold = confidence_threshold
+        self.line_detection = line_detection
+        self.max_lines = max_lines
+        self.pool = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="ocr")
+
+    def detect_lines(self, processed_images):
+        """定位文字行；未启用、未找到或行数过多时返回 None（整图识别）"""
+        if not self.line_detection:
+            return None
+        boxes = detect_text_lines(processed_images["original_gray"])
+        if not boxes or len(boxes) > self.max_lines:
+            return None
+        return boxes
+
+    def _run_method(self, method_name, processed_img, config_str):
+        """执行单个 OCR 任务并计时，返回 (文本, 平均置信度, 耗时)"""
+        start = time.perf_counter()
+        text, confidence = self.backend.image_to_data(processed_img, config_str)
+        cleaned = ' '.join(text.strip().split())
+        return cleaned, confidence, time.perf_counter() - start
+
+    def _submit_method(self, method, processed_images, boxes):
+        """提交一个方案：整图一个任务，或每个文字行裁剪图一个任务（单行模式）"""
+        method_name, image_key, config_str = method
+        image = processed_images[image_key]
+        if boxes is None:
+            return [self.pool.submit(self._run_method, method_name, image, config_str)]
+        config_str = line_config(config_str)
+        return [self.pool.submit(self._run_method, method_name, image[y:y + h, x:x + w], config_str)
+                for x, y, w, h in boxes]
+
+    def evaluate(self, method, processed_images, boxes=None):
+        """单独运行一个方案（不提前停止），返回 (文本, 平均置信度, 耗时)"""
+        return self._combine([future.result() for future in self._submit_method(method, processed_images, boxes)])
+
+    @staticmethod
+    def _combine(results):
+        """按阅读顺序拼接各行结果，置信度按字符数加权平均，耗时累加"""
+        texts = [text for text, _, _ in results if text]
+        total_chars = sum(len(text) for text in texts)
+        confidence = (sum(conf * len(text) for text, conf, _ in results if text) / total_chars
+                      if total_chars else 0.0)
+        return ' '.join(texts), confidence, sum(elapsed for _, _, elapsed in results)
+
+    def score(self, text, confidence):
+        """候选结果评分：平均置信度 × 有效字符比例（乱码即使更长也得分更低），过短的碎片按长度降权"""
+        length_factor = min(1.0, len(text) / max(1, self.min_chars))
+        return confidence * ocr_text_quality(text) * length_factor
+
+    def is_good_enough(self, text, confidence):
+        """判断识别结果是否已足够好，可以停止尝试其他方案"""
+        return (len(text) >= self.min_chars and confidence >= self.confidence_threshold
+                and ocr_text_quality(text) >= self.quality_threshold)
+
+    def run(self, processed_images, methods=OCR_METHODS, boxes=None):
+        """识别并返回 (最佳文本, 最佳方法, {方法名: 耗时秒数})
+
+        先单独运行排在首位的方案，置信度达标就直接返回（清晰的对话框通常只需一次识别）；
+        否则并行运行其余方案，取评分最高的结果，任一方案达标即取消剩余方案。
+        boxes 为文字行位置时，每个方案对各行裁剪图并行识别后按阅读顺序拼接。
+        """
+        methods = list(methods)
+        best = {"text": "", "method": "", "score": -1.0}
+        timings = {}
+
+        def submit(method):
+            return self._submit_method(method, processed_images, boxes)
+
+        def consider(method_name, futures):
+            """记录一个方案（全部任务完成）的结果，达标时返回 True"""
+            try:
+                cleaned, confidence, elapsed = self._combine([future.result() for future in futures])
+            except Exception as e:
+                print(f"方法 {method_name} 失败: {e}")
+                return False
+
+            timings[method_name] = elapsed
+            print(f"方法 {method_name} 用时 {elapsed * 1000:.0f}ms，识别到 {len(cleaned)} 个字符，"
+                  f"置信度 {confidence:.0f}")
+
+            score = self.score(cleaned, confidence)
+            good = self.is_good_enough(cleaned, confidence)
+            if cleaned and (good or score > best["score"]):
+                best.update(text=cleaned, method=method_name, score=score)
+                print(f"方法 {method_name} 识别到 {len(cleaned)} 个字符: {cleaned[:50]}...")
+            return good
+
+        if not methods:
+            return "", "", timings
+
+        if consider(methods[0][0], submit(methods[0])):
+            return best["text"], best["method"], timings
+
+        pending = {}  # 方案名 -> 尚未完成的任务数
+        method_futures = {}
+        futures = {}
+        for method in methods[1:]:
+            method_futures[method[0]] = submit(method)
+            pending[method[0]] = len(method_futures[method[0]])
+            for future in method_futures[method[0]]:
+                futures[future] = method[0]
+        for future in as_completed(futures):
+            method_name = futures[future]
+            pending[method_name] -= 1
+            if pending[method_name] == 0 and consider(method_name, method_futures[method_name]):
+                # 已有足够好的结果，不再等待其余方案
+                break
+
+        # 取消尚未开始的方案
+        for future in futures:
+            future.cancel()
+
+        return best["text"], best["method"], timings
+
+    def shutdown(self):
+        self.pool.shutdown(wait=True)
+        self.backend.close()
+
+
+# ==================== OCR 自适应配置档 ====================
+class OCRProfile:
+    """一个游戏（或区域）的 OCR 方案统计：运行次数、胜出次数、累计耗时"""
+
+    def __init__(self, name, stats=None, prune_runs=OCR_PROFILE_PRUNE_RUNS):
+        self.name = name
+        self.stats = stats if stats is not None else {}  # 方法名 -> {"runs", "wins", "seconds"}
+        self.prune_runs = prune_runs
+        self.records = 0
+
+    def win_rate(self, method_name):
+        """平滑后的胜率，未运行过的方案为 0.5"""
+        entry = self.stats.get(method_name)
+        if not entry:
+            return 0.5
+        return (entry["wins"] + 1) / (entry["runs"] + 2)
+
+    def mean_latency(self, method_name):
+        entry = self.stats.get(method_name)
+        if not entry or not entry["runs"]:
+            return 0.0
+        return entry["seconds"] / entry["runs"]
+
+    def is_pruned(self, method_name):
+        """运行足够多次却从未胜出的方案"""
+        entry = self.stats.get(method_name)
+        return bool(entry) and entry["runs"] >= self.prune_runs and entry["wins"] == 0
+
+    def ordered_methods(self, methods=OCR_METHODS):
+        """按胜率从高到低、耗时从低到高排列方案，并去掉从未胜出的方案（至少保留一个）"""
+        ordered = sorted(methods, key=lambda m: (-self.win_rate(m[0]), self.mean_latency(m[0])))
+        active = [method for method in ordered if not self.is_pruned(method[0])]
+        return active or ordered[:1]
+
+    def record(self, best_method, timings):
+        """记录一次识别：运行过的方案计次计时，最佳方案计一次胜出"""
+        for method_name, elapsed in timings.items():
+            entry = self.stats.setdefault(method_name, {"runs": 0, "wins": 0, "seconds": 0.0})
+            entry["runs"] += 1
+            entry["seconds"] += elapsed
+            if method_name == best_method:
+                entry["wins"] += 1
+        self.records += 1
+
+    def summary_lines(self):
+        """统计表（供性能统计窗口显示）"""
+        lines = [f"OCR 配置档: {self.name}",
+                 f"{'方案':<20}{'胜出/运行':>12}{'胜率':>8}{'平均(ms)':>10}"]
+        for method_name, _, _ in self.ordered_methods():
+            entry = self.stats.get(method_name, {"runs": 0, "wins": 0})
+            lines.append(f"{method_name:<20}{entry['wins']:>6}/{entry['runs']:<5}"
+                         f"{self.win_rate(method_name) * 100:>7.0f}%{self.mean_latency(method_name) * 1000:>10.0f}")
+        pruned = [name for name, _, _ in OCR_METHODS if self.is_pruned(name)]
+        if pruned:
+            lines.append(f"已停用: {', '.join(pruned)}")
+        return lines
+
+
+class OCRProfileStore:
+    """OCR 配置档的 JSON 持久化（与 config.ini 同目录）"""
+
+    def __init__(self, path=OCR_PROFILE_PATH, save_every=10):
+        self.path = path
+        self.save_every = save_every
+        self.profiles = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            for name, stats in data.items():
+                self.profiles[name] = OCRProfile(name, stats)
+        except Exception as e:
+            print(f"⚠️  警告: 无法读取 OCR 配置档 {self.path}: {e}")
+
+    def names(self):
+        with self._lock:
+            return sorted(self.profiles)
+
+    def get(self, name):
+        """取出配置档，不存在则新建"""
+        with self._lock:
+            profile = self.profiles.get(name)
+            if profile is None:
+                profile = self.profiles[name] = OCRProfile(name)
+            return profile
+
+    def record(self, profile, best_method, timings):
+        """记录一次识别结果，每 save_every 次写一次文件"""
+        with self._lock:
+            profile.record(best_method, timings)
+            self._dirty = True
+            due = profile.records % self.save_every == 0
+        if due:
+            self.save()
+
+    def replace(self, name, stats):
+        """用新的统计覆盖配置档并立即保存（离线调优使用）"""
+        profile = self.get(name)
+        with self._lock:
+            profile.stats = stats
+            self._dirty = True
+        self.save()
+
+    def save(self):
+        """原子写入：先写临时文件再替换"""
+        with self._lock:
+            if not self._dirty:
+                return
+            data = {name: profile.stats for name, profile in self.profiles.items()}
+            self._dirty = False
+        tmp_path = self.path + ".tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            print(f"⚠️  警告: 无法保存 OCR 配置档 {self.path}: {e}")
+
+
+# ==================== 翻译缓存 ====================
+def normalize_source_text(text):
+    """规范化原文：去除首尾空白并合并连续空白"""
+    return ' '.join(text.split())
+
+
+class TranslationCache:
+    """两级翻译缓存：内存 LRU + SQLite 持久化存储（按数量和时间淘汰）"""
+
+    # 每写入多少条执行一次磁盘淘汰
+    EVICT_INTERVAL = 100
+
+    def __init__(self, path=CACHE_PATH, memory_size=CACHE_MEMORY_SIZE,
+                 max_entries=CACHE_MAX_ENTRIES, max_age_days=CACHE_MAX_AGE_DAYS):
+        self.memory_size = memory_size
+        self.max_entries = max_entries
+        self.max_age = max_age_days * 86400
+        self.memory = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._puts = 0
+        self._lock = threading.Lock()
+
+        try:
+            self.db = sqlite3.connect(path, check_same_thread=False)
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS translations ("
+                "key TEXT PRIMARY KEY, source TEXT, translation TEXT, "
+                "created_at REAL, last_access REAL, fingerprint TEXT)"
+            )
+            # 旧版数据库没有 fingerprint 列：补上，旧条目指纹为空，只能精确命中、不进入翻译记忆
+            columns = [row[1] for row in self.db.execute("PRAGMA table_info(translations)")]
+            if "fingerprint" not in columns:
+                self.db.execute("ALTER TABLE translations ADD COLUMN fingerprint TEXT")
+            self.db.execute("CREATE INDEX IF NOT EXISTS idx_last_access ON translations(last_access)")
+            self.db.commit()
+            self._evict()
+        except sqlite3.Error as e:
+            print(f"⚠️  警告: 翻译缓存数据库不可用，仅使用内存缓存: {e}")
+            self.db = None
+
+    @staticmethod
+    def make_key(text, model=MODEL_NAME):
+        """缓存键：规范化原文 + 模型 + 提示词 + 温度"""
+        raw = "\x1f".join([normalize_source_text(text), model, SYSTEM_PROMPT, PRE_PROMPT, repr(TEMPERATURE)])
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def fingerprint(model=MODEL_NAME):
+        """设置指纹：模型 + 提示词 + 温度，与条目一起保存，翻译记忆只索引指纹相同的条目"""
+        raw = "\x1f".join([model, SYSTEM_PROMPT, PRE_PROMPT, repr(TEMPERATURE)])
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()[:16]
+
+    def _remember(self, key, translation):
+        self.memory[key] = translation
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_size:
+            self.memory.popitem(last=False)
+
+    def get(self, text):
+        """查询缓存，未命中返回 None"""
+        key = self.make_key(text)
+        with self._lock:
+            translation = self.memory.get(key)
+            if translation is not None:
+                self.memory.move_to_end(key)
+                self.hits += 1
+                return translation
+
+            if self.db is not None:
+                try:
+                    row = self.db.execute(
+                        "SELECT translation, created_at FROM translations WHERE key = ?", (key,)
+                    ).fetchone()
+                    now = time.time()
+                    if row and now - row[1] <= self.max_age:
+                        self.db.execute("UPDATE translations SET last_access = ? WHERE key = ?", (now, key))
+                        self.db.commit()
+                        self._remember(key, row[0])
+                        self.hits += 1
+                        return row[0]
+                except sqlite3.Error as e:
+                    print(f"读取翻译缓存失败: {e}")
+
+            self.misses += 1
+            return None
+
+    def put(self, text, translation, model=MODEL_NAME):
+        """写入缓存；备用端点（其他模型）的译文按实际应答的模型记录，不会被当作主模型的译文命中"""
+        key = self.make_key(text, model)
+        with self._lock:
+            self._remember(key, translation)
+            if self.db is None:
+                return
+            try:
+                now = time.time()
+                self.db.execute(
+                    "INSERT OR REPLACE INTO translations "
+                    "(key, source, translation, created_at, last_access, fingerprint) VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, normalize_source_text(text), translation, now, now, self.fingerprint(model))
+                )
+                self.db.commit()
+                self._puts += 1
+                if self._puts % self.EVICT_INTERVAL == 0:
+                    self._evict()
+            except sqlite3.Error as e:
+                print(f"写入翻译缓存失败: {e}")
+
+    def _evict(self):
+        """删除过期条目，并按最近访问时间裁剪到最大条数"""
+        self.db.execute("DELETE FROM translations WHERE created_at < ?", (time.time() - self.max_age,))
+        self.db.execute(
+            "DELETE FROM translations WHERE key IN ("
+            "SELECT key FROM translations ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        )
+        self.db.commit()
+
+    def entries(self, limit=None):
+        """按最近访问时间倒序返回当前设置（模型、提示词、温度）下的 [(原文, 译文)]（供翻译记忆建立索引）"""
+        limit = self.max_entries if limit is None else limit
+        with self._lock:
+            if self.db is None:
+                return []
+            try:
+                return self.db.execute(
+                    "SELECT source, translation FROM translations WHERE created_at >= ? AND fingerprint = ? "
+                    "ORDER BY last_access DESC LIMIT ?", (time.time() - self.max_age, self.fingerprint(), limit)
+                ).fetchall()
+            except sqlite3.Error as e:
+                print(f"读取翻译缓存失败: {e}")
+                return []
+
+    def stats_text(self):
+        total = self.hits + self.misses
+        rate = self.hits / total * 100 if total else 0.0
+        return f"缓存 命中{self.hits}/未命中{self.misses}（{rate:.0f}%）"
+
+    def close(self):
+        with self._lock:
+            if self.db is not None:
+                self.db.close()
+                self.db = None
+
+
+# ==================== 模糊翻译记忆 ====================
+# 独立的数字（不与字母相连）：“10 gold” 与 “100 gold” 不能互相复用译文，而 “Hel1o” 中的 1 视为 OCR 噪声
+FUZZY_NUMBER_PATTERN = re.compile(r'(?<![A-Za-z])\d+(?![A-Za-z])')
+
+
+def fuzzy_key(text):
+    """模糊匹配用的规范化原文：小写并合并连续空白"""
+    return ' '.join(text.lower().split())
+
+
+def text_ngrams(text, n=3):
+    """字符 n-gram 集合，短文本整体作为一个 gram"""
+    if len(text) <= n:
+        return {text}
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+
+def edit_distance(a, b, max_dist):
+    """带状 Levenshtein 距离：只计算 |i - j| <= max_dist 的对角带，超过 max_dist 时提前返回 max_dist + 1"""
+    over = max_dist + 1
+    if abs(len(a) - len(b)) > max_dist:
+        return over
+    if len(a) < len(b):
+        a, b = b, a
+    n = len(b)
+    # 带外的格子视为 over，距离封顶为 over
+    previous = [j if j <= max_dist else over for j in range(n + 1)]
+    for i, ch_a in enumerate(a, 1):
+        current = [over] * (n + 1)
+        if i <= max_dist:
+            current[0] = i
+        row_min = current[0]
+        for j in range(max(1, i - max_dist), min(n, i + max_dist) + 1):
+            value = previous[j - 1] + (ch_a != b[j - 1])
+            if previous[j] + 1 < value:
+                value = previous[j] + 1
+            if current[j - 1] + 1 < value:
+                value = current[j - 1] + 1
+            if value > over:
+                value = over
+            current[j] = value
+            if value < row_min:
+                row_min = value
+        if row_min > max_dist:
+            return over
+        previous = current
+    return previous[n]
+
+
+class TranslationMemory:
+    """模糊翻译记忆：字符三元组倒排索引 + 编辑距离校验
+
+    查询时按罕见程度依次探查三元组，最多 3k+1 个（k 为阈值允许的最大编辑距离，k 处编辑最多破坏 3k 个三元组），
+    并限制累计扫描的倒排条目数；超过 max_length 的长文本不做模糊匹配（编辑距离的带宽随长度增长）。
+    查询在后台线程中执行，不阻塞界面。
+    """
+
+    def __init__(self, threshold=TM_THRESHOLD, provisional_threshold=TM_PROVISIONAL_THRESHOLD,
+                 min_length=6, max_length=TM_MAX_LENGTH, max_candidates=20, max_postings=20000):
+        self.threshold = threshold
+        self.provisional_threshold = min(provisional_threshold, threshold)
+        self.min_length = min_length
+        self.max_length = max_length
+        self.max_candidates = max_candidates
+        self.max_postings = max_postings
+        self.sources = []
+        self.translations = []
+        self.numbers = []
+        self.positions = {}  # 规范化原文 -> 条目编号
+        self.index = {}  # 三元组 -> 条目编号列表
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.sources)
+
+    def _add(self, key, translation):
+        entry_id = self.positions.get(key)
+        if entry_id is not None:
+            self.translations[entry_id] = translation
+            return
+        entry_id = len(self.sources)
+        self.positions[key] = entry_id
+        self.sources.append(key)
+        self.translations.append(translation)
+        self.numbers.append(FUZZY_NUMBER_PATTERN.findall(key))
+        index = self.index
+        for gram in text_ngrams(key):
+            postings = index.get(gram)
+            if postings is None:
+                index[gram] = [entry_id]
+            else:
+                postings.append(entry_id)
+
+    def add(self, source, translation):
+        """加入一条记忆，原文相同则更新译文"""
+        key = fuzzy_key(source)
+        if key:
+            with self._lock:
+                self._add(key, translation)
+
+    def load(self, cache, chunk_size=5000):
+        """从翻译缓存数据库建立索引（分块加锁，加载期间仍可查询）"""
+        start = time.perf_counter()
+        rows = cache.entries()
+        for offset in range(0, len(rows), chunk_size):
+            with self._lock:
+                for source, translation in rows[offset:offset + chunk_size]:
+                    key = fuzzy_key(source)
+                    if key:
+                        self._add(key, translation)
+        print(f"✅ 翻译记忆已加载 {len(self)} 条，用时 {(time.perf_counter() - start) * 1000:.0f}ms")
+
+    def lookup(self, text):
+        """查找最相似的已翻译原文，返回 (相似度, 原文, 译文)，低于临时结果阈值时返回 None"""
+        key = fuzzy_key(text)
+        if not self.min_length <= len(key) <= self.max_length:
+            return None
+        numbers = FUZZY_NUMBER_PATTERN.findall(key)
+        # 相似度 = 1 - 距离 / 较长文本长度，据此推出允许的最大距离和候选长度范围
+        t = self.provisional_threshold
+        max_dist = int((1 - t) * len(key) / t)
+        min_len, max_len = len(key) * t, len(key) / t
+
+        with self._lock:
+            postings = sorted((self.index[g] for g in text_ngrams(key) if g in self.index), key=len)
+            counts = Counter()
+            budget = self.max_postings
+            for i, entry_ids in enumerate(postings[:3 * max_dist + 1]):
+                # 越往后的三元组越常见，超出扫描预算即停止（至少探查最罕见的一个）
+                if i and len(entry_ids) > budget:
+                    break
+                counts.update(entry_ids)
+                budget -= len(entry_ids)
+            candidates = [entry_id for entry_id, _ in counts.most_common(self.max_candidates)]
+
+            best = None
+            for entry_id in candidates:
+                source = self.sources[entry_id]
+                if not min_len <= len(source) <= max_len or self.numbers[entry_id] != numbers:
+                    continue
+                longest = max(len(key), len(source))
+                limit = int((1 - t) * longest)
+                if best is not None:
+                    limit = min(limit, int((1 - best[0]) * longest))
+                distance = edit_distance(key, source, limit)
+                if distance > limit:
+                    continue
+                similarity = 1 - distance / longest
+                if best is None or similarity > best[0]:
+                    best = (similarity, source, self.translations[entry_id])
+                    if distance == 0:
+                        break
+        return best
+
+
+# ==================== 流式输出 ====================
+class StreamRenderer:
+    """收集流式返回的文本片段，通过 root.after 批量写入文本框，避免频繁刷新界面
+
+    is_current() 在主线程中判断文本框是否仍属于这个请求，不属于时丢弃片段（多个请求同时进行时不会混在一起）。
+    """
+
+    def __init__(self, root, text_widget, is_current=None, interval_ms=STREAM_FLUSH_MS):
+        self.root = root
+        self.text_widget = text_widget
+        self.is_current = is_current
+        self.interval_ms = interval_ms
+        self._pending = []
+        self._scheduled = False
+        self._started = False
+        self._closed = False
+        self._lock = threading.Lock()
+
+    def push(self, piece):
+        """（工作线程）追加片段，必要时安排一次刷新"""
+        if self.is_current is not None and not self.is_current():
+            return
+        with self._lock:
+            if self._closed:
+                return
+            self._pending.append(piece)
+            if self._scheduled:
+                return
+            self._scheduled = True
+        self.root.after(self.interval_ms, self._flush)
+
+    def _flush(self):
+        """（主线程）把累积的片段一次性写入文本框"""
+        with self._lock:
+            if self._closed:
+                return
+            text = ''.join(self._pending)
+            self._pending.clear()
+            self._scheduled = False
+
+        if self.is_current is not None and not self.is_current():
+            return
+        if not self._started:
+            # 第一次写入时清除“思考中”提示
+            self.text_widget.delete("1.0", tk.END)
+            self._started = True
+        self.text_widget.insert(tk.END, text)
+        self.text_widget.see(tk.END)
+
+    def close(self):
+        """停止刷新，之后由完整结果覆盖文本框"""
+        with self._lock:
+            self._closed = True
+            self._pending.clear()
+
+
+# ==================== 屏幕截图 ====================
+class ScreenCapture:
+    """复用同一个 mss 句柄并缓存显示器几何信息，截图以 BGRA numpy 数组返回（不复制像素）
+
+    mss 句柄与创建它的线程绑定，因此每个线程应使用自己的实例。
+    """
+
+    def __init__(self):
+        self.sct = mss.mss()
+        self.refresh_monitors()
+
+    def refresh_monitors(self):
+        """重新读取显示器布局（如插拔显示器后）"""
+        all_monitors = self.sct.monitors
+        # monitor 0 是整个虚拟屏幕
+        self.virtual_monitor = all_monitors[0]
+        self.virtual_left = min(monitor['left'] for monitor in all_monitors)
+        self.virtual_top = min(monitor['top'] for monitor in all_monitors)
+        right = max(monitor['left'] + monitor['width'] for monitor in all_monitors)
+        bottom = max(monitor['top'] + monitor['height'] for monitor in all_monitors)
+        self.virtual_width = right - self.virtual_left
+        self.virtual_height = bottom - self.virtual_top
+
+    def grab(self, region):
+        """截取指定区域，返回直接引用 mss 缓冲区的 BGRA 数组"""
+        screenshot = self.sct.grab(region)
+        return np.frombuffer(screenshot.raw, dtype=np.uint8).reshape(screenshot.height, screenshot.width, 4)
+
+    def grab_virtual(self):
+        """截取整个虚拟屏幕"""
+        return self.grab(self.virtual_monitor)
+
+    def to_screen_region(self, left, top, right, bottom):
+        """把相对虚拟屏幕左上角的坐标转换为 mss 区域（考虑多个显示器）"""
+        return {
+            "left": int(self.virtual_left + left),
+            "top": int(self.virtual_top + top),
+            "width": int(right - left),
+            "height": int(bottom - top)
+        }
+
+    @staticmethod
+    def crop(frame, left, top, right, bottom):
+        """从已截取的帧中裁剪区域（返回视图，不复制像素）"""
+        height, width = frame.shape[:2]
+        left, right = max(0, int(left)), min(width, int(right))
+        top, bottom = max(0, int(top)), min(height, int(bottom))
+        return frame[top:bottom, left:right]
+
+    @staticmethod
+    def to_rgb(frame):
+        """BGRA 转 RGB，只转换传入的（已裁剪的）像素"""
+        return cv2.cvtColor(frame, cv2.COLOR_BGRA2RGB)
+
+    def close(self):
+        self.sct.close()
+
+
+# ==================== 区域监视 ====================
+class RegionWatcher:
+    """后台按固定频率截取锁定区域，仅当画面发生变化并重新稳定后才回调"""
+
+    # 计算帧差异时使用的缩略图宽度
+    THUMB_WIDTH = 64
+
+    def __init__(self, region, on_change, interval_ms=WATCH_INTERVAL_MS, diff_threshold=WATCH_DIFF_THRESHOLD):
+        self.region = region
+        self.on_change = on_change
+        self.interval = interval_ms / 1000
+        self.diff_threshold = diff_threshold
+        self._stop = threading.Event()
+        self._thread = None
+
+    @classmethod
+    def frame_signature(cls, frame):
+        """把 BGRA 帧缩小为灰度缩略图，用于快速比较"""
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGRA2GRAY)
+        height, width = gray.shape
+        thumb_height = max(1, height * cls.THUMB_WIDTH // max(1, width))
+        thumb = cv2.resize(gray, (cls.THUMB_WIDTH, thumb_height), interpolation=cv2.INTER_AREA)
+        return thumb.astype(np.int16)
+
+    @staticmethod
+    def frame_diff(a, b):
+        """两张缩略图的平均绝对差（0-255）"""
+        return float(np.mean(np.abs(a - b)))
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        # mss 句柄需在使用它的线程中创建
+        capture = ScreenCapture()
+        try:
+            previous = None
+            # 首帧稳定后也触发一次识别
+            pending = True
+            wait = 0
+            while not self._stop.wait(wait):
+                start = time.perf_counter()
+                try:
+                    frame = capture.grab(self.region)
+                    signature = self.frame_signature(frame)
+                    if previous is not None:
+                        diff = self.frame_diff(signature, previous)
+                        if diff > self.diff_threshold:
+                            # 画面仍在变化（如逐字显示的对话），等待稳定
+                            pending = True
+                        elif pending:
+                            pending = False
+                            self.on_change(frame)
+                    previous = signature
+                except Exception as e:
+                    print(f"区域监视截图失败: {e}")
+                wait = max(0, self.interval - (time.perf_counter() - start))
+        finally:
+            capture.close()
+
+
+# ==================== 保存的截图区域 ====================
+# 程序自身占用的热键，保存的区域不能使用
+RESERVED_HOTKEYS = ("<F7>", "<F8>", "<F9>", "<F10>", "<Escape>")
+
+
+def hotkey_sequence(hotkey):
+    """把 "F2"、"Control-1" 这样的写法转换为 Tk 事件序列（单个数字视为按键而不是鼠标按钮）"""
+    parts = hotkey.strip().strip("<>").split("-")
+    if len(parts[-1]) == 1 and parts[-1].isdigit():
+        parts[-1] = "Key-" + parts[-1]
+    return "<" + "-".join(parts) + ">"
+
+
+class RegionStore:
+    """命名截图区域的 JSON 持久化（与 config.ini 同目录）"""
+
+    def __init__(self, path=REGIONS_PATH):
+        self.path = path
+        self.regions = {}
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            for name, entry in data.items():
+                self.regions[name] = {
+                    "region": {key: int(entry["region"][key]) for key in ("left", "top", "width", "height")},
+                    "hotkey": entry.get("hotkey", ""),
+                    "profile": entry.get("profile", ""),
+                }
+        except Exception as e:
+            print(f"⚠️  警告: 无法读取截图区域 {self.path}: {e}")
+
+    def names(self):
+        return sorted(self.regions)
+
+    def get(self, name):
+        return self.regions.get(name)
+
+    def add(self, name, region, hotkey="", profile=""):
+        """新增或覆盖同名区域并立即保存"""
+        self.regions[name] = {"region": dict(region), "hotkey": hotkey, "profile": profile}
+        self.save()
+
+    def remove(self, name):
+        if self.regions.pop(name, None) is not None:
+            self.save()
+
+    def save(self):
+        """原子写入：先写临时文件再替换"""
+        tmp_path = self.path + ".tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.regions, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            print(f"⚠️  警告: 无法保存截图区域 {self.path}: {e}")
+
+
+# ==================== 预览缩略图 ====================
+PREVIEW_MAX_SIZE = (300, 150)
+
+
+def make_thumbnail(rgb, max_size=PREVIEW_MAX_SIZE):
+    """直接从 RGB numpy 缓冲区生成预览缩略图：大幅缩小时先按整数步长抽样，再用 INTER_AREA 缩放"""
+    height, width = rgb.shape[:2]
+    max_w, max_h = max_size
+    ratio = min(max_w / width, max_h / height)
+    size = (max(1, int(width * ratio)), max(1, int(height * ratio)))
+    if ratio >= 1:
+        return cv2.resize(rgb, size, interpolation=cv2.INTER_LINEAR)
+    # 保留 2 倍余量给面积插值，抽样本身不产生拷贝
+    step = int(1 / ratio) // 2
+    if step > 1:
+        rgb = np.ascontiguousarray(rgb[::step, ::step])
+    return cv2.resize(rgb, size, interpolation=cv2.INTER_AREA)
+
+
+class PreviewRenderer:
+    """预览图显示：尺寸不变时向同一个 PhotoImage paste 新内容；窗口隐藏时只记下最新的缩略图"""
+
+    def __init__(self, root, label):
+        self.root = root
+        self.label = label
+        self.photo = None
+        self.pending = None
+
+    def show(self, thumbnail):
+        """（主线程）显示 RGB 缩略图"""
+        if self.root.state() == 'withdrawn':
+            # 窗口隐藏时不渲染，恢复显示时再画最新的一张
+            self.pending = thumbnail
+            return
+        self.pending = None
+        image = Image.fromarray(thumbnail)
+        if self.photo is not None and (self.photo.width(), self.photo.height()) == image.size:
+            self.photo.paste(image)
+            return
+        self.photo = ImageTk.PhotoImage(image)
+        self.label.config(image=self.photo, text="")
+        self.label.image = self.photo
+
+    def flush(self):
+        """窗口恢复显示后补画隐藏期间的最新预览"""
+        if self.pending is not None:
+            self.show(self.pending)
+
+    def clear(self):
+        self.photo = None
+        self.pending = None
+        self.label.config(image="", text="无截图")
+        self.label.image = None
+
+
+# ==================== 选区覆盖窗口 ====================
+class SelectionOverlay:
+    """覆盖整个虚拟屏幕的选区窗口
+
+    选框和尺寸标签只创建一次，拖动时只更新 coords；鼠标移动事件按刷新率合并，
+    每帧最多重绘一次。
+    """
+
+    def __init__(self, root, capture, frame, on_select, on_cancel,
+                 refresh_hz=OVERLAY_REFRESH_HZ, show_frozen=OVERLAY_SHOW_FROZEN,
+                 frozen_downscale=OVERLAY_FROZEN_DOWNSCALE):
+        self.on_select = on_select
+        self.on_cancel = on_cancel
+        self.frame_ms = max(1, int(1000 / max(1, refresh_hz)))
+        self.start = None
+        self.pointer = None
+        self.redraw_job = None
+        self.background = None
+
+        width, height = capture.virtual_width, capture.virtual_height
+        self.window = tk.Toplevel(root)
+        self.window.attributes("-topmost", True)
+        self.window.overrideredirect(True)
+        self.window.config(bg='black')
+        # 设置窗口位置和大小以覆盖所有显示器
+        self.window.geometry(f"{width}x{height}+{capture.virtual_left}+{capture.virtual_top}")
+
+        self.canvas = tk.Canvas(self.window, cursor="cross", bg="black", highlightthickness=0)
+        self.canvas.pack(fill=tk.BOTH, expand=True)
+
+        if show_frozen and frame is not None:
+            # 显示冻结的截图，选中的就是实际会被裁剪的画面
+            self.background = self._frozen_background(root, frame, max(1, frozen_downscale))
+            self.canvas.create_image(0, 0, anchor="nw", image=self.background)
+        else:
+            self.window.attributes("-alpha", 0.3)
+
+        self.rect = self.canvas.create_rectangle(0, 0, 0, 0, outline="red", width=2, dash=(4, 2),
+                                                 state="hidden")
+        self.size_label = self.canvas.create_text(0, 0, text="", fill="yellow",
+                                                  font=("Arial", 10, "bold"), state="hidden")
+
+        self.canvas.bind("<ButtonPress-1>", self._on_press)
+        self.canvas.bind("<B1-Motion>", self._on_motion)
+        self.canvas.bind("<ButtonRelease-1>", self._on_release)
+        self.canvas.bind("<Escape>", lambda e: self.on_cancel())
+        self.canvas.focus_set()
+
+    @staticmethod
+    def _frozen_background(root, frame, downscale):
+        """BGRA 截图按整数倍缩小后只转换一次，再由 Tk 按同样倍数放大回屏幕尺寸（调暗以示处于选区模式）"""
+        height, width = frame.shape[:2]
+        if downscale > 1:
+            frame = cv2.resize(frame, (width // downscale, height // downscale),
+                               interpolation=cv2.INTER_AREA)
+        rgb = cv2.convertScaleAbs(ScreenCapture.to_rgb(frame), alpha=0.7)
+        small = ImageTk.PhotoImage(Image.fromarray(rgb), master=root)
+        if downscale == 1:
+            return small
+        zoomed = tk.PhotoImage(master=root)
+        zoomed.tk.call(zoomed, "copy", small, "-zoom", downscale, downscale)
+        return zoomed
+
+    def _on_press(self, event):
+        self.start = (event.x, event.y)
+        self.pointer = self.start
+        self._redraw()
+        self.canvas.itemconfigure(self.rect, state="normal")
+        self.canvas.itemconfigure(self.size_label, state="normal")
+
+    def _on_motion(self, event):
+        if self.start is None:
+            return
+        # 只记下最新位置，每帧最多重绘一次
+        self.pointer = (event.x, event.y)
+        if self.redraw_job is None:
+            self.redraw_job = self.canvas.after(self.frame_ms, self._redraw)
+
+    def _redraw(self):
+        self.redraw_job = None
+        x0, y0 = self.start
+        x1, y1 = self.pointer
+        self.canvas.coords(self.rect, x0, y0, x1, y1)
+
+        # 显示选择区域的尺寸
+        width = abs(x1 - x0)
+        height = abs(y1 - y0)
+        label_x = min(x0, x1) + width / 2
+        label_y = min(y0, y1) - 20
+        if label_y < 0:
+            label_y = min(y0, y1) + height + 20
+        self.canvas.coords(self.size_label, label_x, label_y)
+        self.canvas.itemconfigure(self.size_label, text=f"{width} x {height}")
+
+    def _on_release(self, event):
+        if self.start is None:
+            return
+        x0, y0 = self.start
+        x1, y1 = event.x, event.y
+        self.start = None
+        self.on_select(min(x0, x1), min(y0, y1), max(x0, x1), max(y0, y1))
+
+    def close(self):
+        if self.redraw_job is not None:
+            self.canvas.after_cancel(self.redraw_job)
+            self.redraw_job = None
+        self.window.destroy()
+        self.background = None
+
+
+# ==================== 截图识别流水线 ====================
+class PipelineJob:
+    """流水线中的一次识别任务，各级依次填充字段"""
+
+    def __init__(self, trace, frame=None, crop=None, image=None, region=None, profile="", recognize=True):
+        self.trace = trace
+        self.frame = frame  # BGRA 原始帧（截图阶段转换后释放）
+        self.crop = crop  # (left, top, right, bottom)，在 frame 上裁剪
+        self.image = image  # RGB numpy 图像
+        self.region = region  # mss 屏幕区域：由截图线程直接截取
+        self.profile = profile  # 指定的 OCR 配置档（为空时使用当前配置档）
+        self.recognize = recognize
+        self.processed = None
+        self.boxes = None
+        self.text = ""
+        self.method = ""
+        self.timings = {}
+        self.started = 0.0
+        self.elapsed = 0.0
+        self.error = None
+
+
+class CapturePipeline:
+    """截图 → 预处理 → OCR 流水线：每级一个工作线程，由有界队列连接
+
+    界面线程只提交任务；各级的结果（"preview" / "ocr" / "error"）放入 results 队列，
+    由界面线程定时取出，翻译阶段再交给异步翻译调度器。
+    截图队列中的监视帧只保留最新的一帧；F10 截图和保存区域的任务从不丢弃。
+    """
+
+    def __init__(self, ocr_executor, profiles, get_profile, queue_size=PIPELINE_QUEUE_SIZE):
+        self.ocr_executor = ocr_executor
+        self.profiles = profiles
+        self.get_profile = get_profile
+        # 等待截图的任务：用户触发的任务不设上限，监视帧在提交时合并
+        self._capture_jobs = deque()
+        self._capture_ready = threading.Condition()
+        self.preprocess_queue = queue.Queue(maxsize=max(1, queue_size))
+        self.ocr_queue = queue.Queue(maxsize=max(1, queue_size))
+        self.results = queue.Queue()
+        # 预处理输出复用缓冲区：轮流使用足够多的实例，保证 OCR 使用中的缓冲区不会被覆盖
+        self._preprocessors = [Preprocessor() for _ in range(max(1, queue_size) + 2)]
+        self._next_preprocessor = 0
+        self._screen_capture = None  # 截图线程自己的 mss 句柄（用于直接截取区域）
+
+        for name, take, work, outbox, after in (
+                ("capture", self._next_capture, self._capture, self.preprocess_queue, self._preview),
+                ("preprocess", self.preprocess_queue.get, self._preprocess, self.ocr_queue, None),
+                ("ocr", self.ocr_queue.get, self._ocr, None, None)):
+            thread = threading.Thread(target=self._stage_loop, args=(take, work, outbox, after),
+                                      name=f"pipeline-{name}", daemon=True)
+            thread.start()
+
+    def submit(self, job):
+        """（任意线程）提交任务；监视帧替换尚未开始处理的旧监视帧，其他任务直接排队"""
+        dropped = []
+        with self._capture_ready:
+            if job.trace.kind == "watch":
+                dropped = [item for item in self._capture_jobs if item.trace.kind == "watch"]
+                for item in dropped:
+                    self._capture_jobs.remove(item)
+            self._capture_jobs.append(job)
+            self._capture_ready.notify()
+        for item in dropped:
+            item.trace.meta["dropped"] = True
+            item.trace.finish()
+
+    def _next_capture(self):
+        with self._capture_ready:
+            while not self._capture_jobs:
+                self._capture_ready.wait()
+            return self._capture_jobs.popleft()
+
+    def _stage_loop(self, take, work, outbox, after=None):
+        while True:
+            job = take()
+            try:
+                forward = work(job)
+            except Exception as e:
+                job.error = f"OCR失败: {str(e)}"
+                print(job.error)
+                job.processed = None
+                self.results.put(("error", job))
+                continue
+            if forward:
+                # 下一级忙时在此等待（背压），不丢弃已进入流水线的任务
+                outbox.put(job)
+            if after is not None:
+                after(job)
+
+    def _capture(self, job):
+        """截取区域，或从冻结全屏截图/监视帧中裁剪，并转换为 RGB"""
+        if job.region is not None:
+            if self._screen_capture is None:
+                self._screen_capture = ScreenCapture()
+            with job.trace.stage("grab"):
+                job.frame = self._screen_capture.grab(job.region)
+        if job.image is None:
+            with job.trace.stage("convert"):
+                frame = job.frame
+                if job.crop is not None:
+                    frame = ScreenCapture.crop(frame, *job.crop)
+                job.image = ScreenCapture.to_rgb(frame)
+            job.frame = None
+        return job.recognize
+
+    def _preview(self, job):
+        """任务交给预处理之后再生成预览缩略图，不占用识别的关键路径"""
+        try:
+            with job.trace.stage("preview"):
+                thumbnail = make_thumbnail(job.image)
+        except Exception as e:
+            print(f"生成预览失败: {e}")
+            return
+        self.results.put(("preview", thumbnail))
+
+    def _preprocess(self, job):
+        job.started = time.perf_counter()
+        preprocessor = self._preprocessors[self._next_preprocessor]
+        self._next_preprocessor = (self._next_preprocessor + 1) % len(self._preprocessors)
+
+        # 获取多种预处理后的图像
+        with job.trace.stage("preprocess"):
+            job.processed = preprocessor.process(job.image)
+
+        # 定位文字行，只识别文字行裁剪图
+        with job.trace.stage("detect"):
+            job.boxes = self.ocr_executor.detect_lines(job.processed)
+        return True
+
+    def _ocr(self, job):
+        # 按配置档中的历史胜率依次尝试不同的预处理方法和OCR配置
+        profile = self.profiles.get(job.profile) if job.profile else self.get_profile()
+        with job.trace.stage("ocr"):
+            job.text, job.method, job.timings = self.ocr_executor.run(
+                job.processed, methods=profile.ordered_methods(), boxes=job.boxes)
+        job.elapsed = time.perf_counter() - job.started
+        job.processed = None
+        if job.method:
+            self.profiles.record(profile, job.method, job.timings)
+
+        for method_name, elapsed in job.timings.items():
+            job.trace.add(f"ocr:{method_name}", elapsed)
+        job.trace.meta.update(ocr_method=job.method, ocr_chars=len(job.text),
+                              ocr_lines=len(job.boxes) if job.boxes else 0)
+        self.results.put(("ocr", job))
+        return False
+
+
+# ==================== 提示词构建 ====================
+def safe_text(text):
+    """✅ 安全编码：确保所有字符串为 UTF-8"""
+    return text.encode('utf-8', errors='replace').decode('utf-8')
+
+
+def make_user_content(clean_text):
+    """单段文本的用户消息"""
+    return safe_text(f"{PRE_PROMPT}\n{clean_text}")
+
+
+def build_messages(user_content, history=()):
+    """消息顺序固定为：系统提示 → 历史上下文 → 新文本，保证请求前缀字节稳定"""
+    messages = [{"role": "system", "content": safe_text(SYSTEM_PROMPT)}]
+    messages.extend(history)
+    messages.append({"role": "user", "content": safe_text(user_content)})
+    return messages
+
+
+# ==================== 长文本分块 ====================
+# 句末标点（可带右引号/括号）及其后的空白；中日文句号后不需要空白
+SENTENCE_END_PATTERN = re.compile(r'[.!?…]+["”’」』)）]*\s+|[。！？]+["”’」』)）]*\s*')
+PARAGRAPH_PATTERN = re.compile(r'\n\s*\n')
+PENDING_CHUNK_MARK = "⏳…"
+
+
+def completion_max_tokens(text):
+    """按原文估算译文所需的 max_tokens：原文 token 数的两倍加余量，不超过 COMPLETION_MAX_TOKENS"""
+    return min(COMPLETION_MAX_TOKENS, 2 * estimate_tokens(text) + 64)
+
+
+def split_sentences(paragraph, max_tokens):
+    """按句末标点切分段落（保留原有空白）；超长的句子再按词（无空格时按字符）切开"""
+    pieces = []
+    start = 0
+    for match in SENTENCE_END_PATTERN.finditer(paragraph):
+        pieces.append(paragraph[start:match.end()])
+        start = match.end()
+    if start < len(paragraph):
+        pieces.append(paragraph[start:])
+
+    sentences = []
+    for piece in pieces:
+        if estimate_tokens(piece) <= max_tokens:
+            sentences.append(piece)
+            continue
+        words = re.findall(r'\S+\s*', piece) if ' ' in piece.strip() else list(piece)
+        current = ""
+        for word in words:
+            if current and estimate_tokens(current + word) > max_tokens:
+                sentences.append(current)
+                current = ""
+            current += word
+        if current:
+            sentences.append(current)
+    return sentences
+
+
+def split_into_chunks(text, max_tokens=CHUNK_MAX_TOKENS):
+    """把长文本在段落/句子边界切成不超过 max_tokens 的块，返回 [(块, 拼接译文时块后的分隔符), ...]"""
+    text = text.strip()
+    if max_tokens <= 0 or estimate_tokens(text) <= max_tokens:
+        return [(text, "")]
+
+    chunks = []
+    for paragraph in PARAGRAPH_PATTERN.split(text):
+        current, current_tokens = "", 0
+        for sentence in split_sentences(paragraph.strip(), max_tokens):
+            tokens = estimate_tokens(sentence)
+            if current and current_tokens + tokens > max_tokens:
+                chunks.append([current.strip(), ""])
+                current, current_tokens = "", 0
+            current += sentence
+            current_tokens += tokens
+        if current.strip():
+            chunks.append([current.strip(), ""])
+        if chunks:
+            chunks[-1][1] = "\n\n"
+    chunks[-1][1] = ""
+    return [tuple(chunk) for chunk in chunks]
+
+
+def stitch_chunks(chunks, translations):
+    """按原顺序拼接各块译文，尚未完成的块用占位符表示"""
+    parts = []
+    for (_, separator), translation in zip(chunks, translations):
+        parts.append(PENDING_CHUNK_MARK if translation is None else translation.strip())
+        parts.append(separator)
+    return "".join(parts)
+
+
+# ==================== 批量翻译 ====================
+def build_batch_prompt(texts):
+    """把多段文本编号后合并为一条提示"""
+    lines = [f"{PRE_PROMPT}",
+             f"以下共有{len(texts)}段文本，每段以【编号】开头。请逐段翻译，"
+             f"每段译文以对应的【编号】开头，不要合并、拆分或遗漏任何一段："]
+    for index, text in enumerate(texts, 1):
+        lines.append(f"【{index}】{text}")
+    return "\n".join(lines)
+
+
+def split_batch_reply(reply, count):
+    """按【编号】拆分批量译文，编号不完整时抛出 ValueError"""
+    parts = re.split(r'【(\d+)】', reply or "")
+    results = {}
+    for number, content in zip(parts[1::2], parts[2::2]):
+        results[int(number)] = content.strip()
+    if sorted(results) != list(range(1, count + 1)):
+        raise ValueError(f"批量译文编号不完整：期望 {count} 段，得到 {sorted(results)}")
+    return [results[i] for i in range(1, count + 1)]
+
+
+# ==================== 翻译调度 ====================
+# 请求优先级：数值越小越优先
+PRIORITY_MANUAL = 0  # F10 截图、手动输入
+PRIORITY_BACKGROUND = 1  # 区域监视等后台请求
+
+
+class TokenBucket:
+    """令牌桶：容量为每分钟配额，按速率连续补充"""
+
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.tokens = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, amount, now):
+        """距离有足够令牌还需等待的秒数（单次请求最多按桶容量计）"""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        return 0.0 if self.tokens >= amount else (amount - self.tokens) / self.rate
+
+    def consume(self, amount, now):
+        self._refill(now)
+        self.tokens -= min(amount, self.capacity)
+
+
+class RateLimiter:
+    """客户端限流：每分钟请求数 + 每分钟 token 数两个令牌桶，429 时整体暂停（0 表示不限制）"""
+
+    def __init__(self, rpm=API_RPM, tpm=API_TPM):
+        self.requests = TokenBucket(rpm) if rpm > 0 else None
+        self.tokens = TokenBucket(tpm) if tpm > 0 else None
+        self.paused_until = 0.0
+
+    def delay(self, tokens):
+        """发送一个约 tokens 个 token 的请求前需要等待的秒数"""
+        now = time.monotonic()
+        delay = max(0.0, self.paused_until - now)
+        if self.requests is not None:
+            delay = max(delay, self.requests.delay(1, now))
+        if self.tokens is not None:
+            delay = max(delay, self.tokens.delay(tokens, now))
+        return delay
+
+    def consume(self, tokens):
+        now = time.monotonic()
+        if self.requests is not None:
+            self.requests.consume(1, now)
+        if self.tokens is not None:
+            self.tokens.consume(tokens, now)
+
+    def pause(self, seconds):
+        """服务端限流（429）时暂停所有请求"""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+def estimate_request_tokens(text):
+    """估算一次翻译请求的 token 数：提示词 + 原文 + 译文（按与原文等长估计）"""
+    return estimate_tokens(SYSTEM_PROMPT) + estimate_tokens(PRE_PROMPT) + 2 * estimate_tokens(text)
+
+
+def retry_after_seconds(error):
+    """从错误响应的 Retry-After / retry-after-ms 头读取等待秒数，没有则返回 None"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        from email.utils import parsedate_to_datetime
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def is_retryable_error(error):
+    """429、5xx、超时和连接错误可以重试；其他错误（如 401、400）直接报告"""
+    status = getattr(error, "status_code", None)
+    if status is not None:
+        return status in (408, 409, 429) or status >= 500
+    return isinstance(error, (openai.APIConnectionError, asyncio.TimeoutError))
+
+
+class QueuedRequest:
+    """调度队列中的一个翻译请求"""
+
+    def __init__(self, seq, text, priority, tokens):
+        self.seq = seq
+        self.text = text
+        self.priority = priority
+        self.tokens = tokens
+        self.attempts = 0
+        self.not_before = 0.0  # 重试退避期间不调度
+        self.enqueued = time.monotonic()
+
+
+class TranslationScheduler:
+    """基于 asyncio 的翻译调度器：有界优先级队列 + 客户端限流 + 退避重试
+
+    请求按序号标记，较新的请求使同等或更低优先级的旧请求过期（取消），后台请求不会取消手动请求；
+    手动请求优先于后台请求；
+    提供 translate_many 时，队列中等待的短文本在占用并发名额之前合并为一批（一个任务、一次限流配额）；
+    429/5xx 等错误按 Retry-After 或带抖动的指数退避重新排队。
+    """
+
+    def __init__(self, translate, on_result, on_depth=None,
+                 max_concurrency=MAX_CONCURRENT_REQUESTS, cancel_stale=CANCEL_STALE_REQUESTS,
+                 max_queue=TRANSLATION_QUEUE_SIZE, limiter=None, max_retries=API_MAX_RETRIES,
+                 estimate=estimate_request_tokens, translate_many=None,
+                 batch_window_ms=BATCH_WINDOW_MS, batch_max_segments=BATCH_MAX_SEGMENTS):
+        # translate(text, seq) 与 translate_many(texts, seqs) 为协程函数；
+        # on_result(seq, result, error) 与 on_depth(depth) 在事件循环线程中调用
+        self.translate = translate
+        self.translate_many = translate_many
+        self.batch_window = batch_window_ms / 1000
+        self.batch_max_segments = max(1, batch_max_segments)
+        self.on_result = on_result
+        self.on_depth = on_depth
+        self.cancel_stale = cancel_stale
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max_queue  # None 表示不限制
+        self.limiter = limiter if limiter is not None else RateLimiter()
+        self.max_retries = max_retries
+        self.estimate = estimate
+        self.latest_seq = 0
+        self.retries = 0
+        self.dropped = 0
+        self._seq_lock = threading.Lock()
+        # 以下仅在事件循环线程中访问
+        self._queue = []  # 等待中的请求
+        self._tasks = {}  # 序号 -> (请求, 运行中的任务)，同一批的请求共用一个任务
+
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self._thread.start()
+        self._wakeup = asyncio.run_coroutine_threadsafe(self._create_event(), self.loop).result()
+        asyncio.run_coroutine_threadsafe(self._dispatch_loop(), self.loop)
+
+    @staticmethod
+    async def _create_event():
+        return asyncio.Event()
+
+    def _next_seq(self):
+        with self._seq_lock:
+            self.latest_seq += 1
+            return self.latest_seq
+
+    def supersede(self, priority=PRIORITY_MANUAL):
+        """（任意线程）占用一个新序号，使之前同等或更低优先级的请求过期，返回该序号"""
+        seq = self._next_seq()
+        self.loop.call_soon_threadsafe(self._cancel_older, seq, priority)
+        return seq
+
+    def submit(self, text, priority=PRIORITY_MANUAL):
+        """（任意线程）提交翻译请求，返回其序号"""
+        seq = self._next_seq()
+        self.loop.call_soon_threadsafe(self._enqueue, QueuedRequest(seq, text, priority, self.estimate(text)))
+        return seq
+
+    def _cancel_older(self, seq, priority):
+        if not self.cancel_stale:
+            return
+        # 优先级数值越大越低：只取消同等或更低优先级的旧请求
+        self._queue = [request for request in self._queue
+                       if request.seq >= seq or request.priority < priority]
+        stale, alive = set(), set()
+        for older_seq, (request, task) in self._tasks.items():
+            if older_seq < seq and request.priority >= priority:
+                stale.add(task)
+            else:
+                alive.add(task)
+        # 同一批中还有未过期的请求时不取消
+        for task in stale - alive:
+            task.cancel()
+        self._notify_depth()
+
+    def _enqueue(self, request):
+        self._cancel_older(request.seq, request.priority)
+        self._queue.append(request)
+        if self.max_queue is not None:
+            while len(self._queue) > self.max_queue:
+                # 队列已满：丢弃优先级最低的请求中最旧的一个
+                victim = max(self._queue, key=lambda r: (r.priority, -r.seq))
+                self._queue.remove(victim)
+                self.dropped += 1
+                print(f"翻译队列已满，丢弃请求 #{victim.seq}")
+        self._wakeup.set()
+        self._notify_depth()
+
+    def _running(self):
+        return len({task for _, task in self._tasks.values()})
+
+    def _next_batch(self, ready, now):
+        """从按优先级排好序的可发送请求中取出下一批，返回 (请求列表, 还需等待的秒数)
+
+        合并时第一个请求最多等待 batch_window 收集后续请求，凑满 batch_max_segments 立即发送；
+        tokens 为 None 的请求（分块翻译的长文本）不合并。
+        """
+        first = ready[0]
+        if self.translate_many is None or first.tokens is None:
+            return [first], 0
+        batch = [request for request in ready if request.tokens is not None][:self.batch_max_segments]
+        if len(batch) >= self.batch_max_segments:
+            return batch, 0
+        return batch, first.enqueued + self.batch_window - now
+
+    async def _dispatch_loop(self):
+        """按优先级取出可发送的请求：并发未满、不在退避期、批量窗口已到、限流允许时启动"""
+        while True:
+            self._wakeup.clear()
+            timeout = None
+            if self._queue and self._running() < self.max_concurrency:
+                now = time.monotonic()
+                ready = sorted((request for request in self._queue if request.not_before <= now),
+                               key=lambda r: (r.priority, r.seq))
+                if ready:
+                    batch, delay = self._next_batch(ready, now)
+                    if delay <= 0:
+                        # 一批只占用一次请求配额；tokens 为 None 的请求由 translate 内部为每次 API 调用自行 acquire
+                        tokens = None if batch[0].tokens is None else sum(request.tokens for request in batch)
+                        delay = 0 if tokens is None else self.limiter.delay(tokens)
+                        if delay <= 0:
+                            if tokens is not None:
+                                self.limiter.consume(tokens)
+                            task = self.loop.create_task(self._run(batch))
+                            for request in batch:
+                                self._queue.remove(request)
+                                self._tasks[request.seq] = (request, task)
+                            continue
+                    timeout = delay
+                else:
+                    timeout = min(request.not_before for request in self._queue) - now
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def acquire(self, tokens):
+        """（事件循环线程）等待限流允许后占用配额；一个请求拆成多次 API 调用时逐次调用"""
+        while True:
+            delay = self.limiter.delay(tokens)
+            if delay <= 0:
+                self.limiter.consume(tokens)
+                return
+            await asyncio.sleep(delay)
+
+    async def _run(self, batch):
+        seqs = [request.seq for request in batch]
+        try:
+            if len(batch) == 1:
+                results = [await self.translate(batch[0].text, seqs[0])]
+            else:
+                results = await self.translate_many([request.text for request in batch], seqs)
+        except asyncio.CancelledError:
+            print(f"翻译请求 {', '.join(f'#{seq}' for seq in seqs)} 已过期，已取消")
+        except Exception as e:
+            for request in batch:
+                if request.attempts < self.max_retries and is_retryable_error(e):
+                    self._schedule_retry(request, e)
+                else:
+                    self.on_result(request.seq, None, e)
+        else:
+            for seq, result in zip(seqs, results):
+                self.on_result(seq, result, None)
+        finally:
+            for seq in seqs:
+                self._tasks.pop(seq, None)
+            self._wakeup.set()
+            self._notify_depth()
+
+    def _schedule_retry(self, request, error):
+        """按 Retry-After 或带抖动的指数退避重新排队"""
+        delay = retry_after_seconds(error)
+        if delay is None:
+            delay = min(API_BACKOFF_MAX_S, API_BACKOFF_BASE_MS / 1000 * 2 ** request.attempts)
+            delay *= random.uniform(0.5, 1.0)
+        if getattr(error, "status_code", None) == 429:
+            self.limiter.pause(delay)
+        request.attempts += 1
+        request.not_before = time.monotonic() + delay
+        self._queue.append(request)
+        self.retries += 1
+        print(f"翻译请求 #{request.seq} 失败（{error}），{delay:.1f}s 后第 {request.attempts} 次重试")
+
+    def _notify_depth(self):
+        if self.on_depth is not None:
+            self.on_depth(len(self._tasks) + len(self._queue))
+
+    def close(self, timeout=5):
+        """（任意线程）取消所有请求和调度循环，停止事件循环线程"""
+        async def cancel_all():
+            tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        asyncio.run_coroutine_threadsafe(cancel_all(), self.loop).result(timeout)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout)
+        if not self._thread.is_alive():
+            self.loop.close()
+
+
+# ==================== 多端点与对冲请求 ====================
+class Endpoint:
+    """一个 OpenAI 兼容端点：地址、模型、客户端和健康状态"""
+
+    def __init__(self, name, base_url, api_key, model, timeout=REQUEST_TIMEOUT):
+        self.name = name
+        self.base_url = base_url
+        self.api_key = api_key
+        self.model = model
+        self.timeout = timeout
+        self.failures = 0  # 连续失败次数
+        self.cooldown_until = 0.0
+        self.successes = 0
+        self.errors = 0
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        """API 客户端（首次访问时创建）"""
+        with self._lock:
+            if self._client is None:
+                # 重试由翻译调度器统一处理（限流、Retry-After、优先级），不使用 SDK 自带重试
+                self._client = openai.AsyncOpenAI(api_key=self.api_key, base_url=self.base_url,
+                                                  timeout=self.timeout, max_retries=0)
+            return self._client
+
+
+def load_endpoints(parser=config):
+    """主端点取自 [Settings]，备用端点取自各 [Endpoint.名称] 段（未填写的项沿用主端点）"""
+    endpoints = [Endpoint("primary", API_ADDRESS, API_KEY, MODEL_NAME)]
+    for section in parser.sections():
+        if not section.startswith("Endpoint"):
+            continue
+        name = section.split(".", 1)[1] if "." in section else section
+        endpoints.append(Endpoint(
+            name,
+            parser.get(section, 'api_address', fallback=API_ADDRESS),
+            parser.get(section, 'api_key', fallback=API_KEY).strip(),
+            parser.get(section, 'model_name', fallback=MODEL_NAME),
+            float(parser.get(section, 'request_timeout', fallback=str(REQUEST_TIMEOUT))),
+        ))
+    return endpoints
+
+
+class EndpointPool:
+    """按健康状态选择端点：慢请求对冲到下一个端点、失败切换，连续失败的端点冷却一段时间"""
+
+    def __init__(self, endpoints, hedge=HEDGE_REQUESTS, hedge_min_delay_ms=HEDGE_MIN_DELAY_MS,
+                 failure_threshold=ENDPOINT_FAILURE_THRESHOLD, cooldown_s=ENDPOINT_COOLDOWN_S, window=100):
+        self.endpoints = list(endpoints)
+        self.hedge = hedge
+        self.hedge_min_delay = hedge_min_delay_ms / 1000
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown_s
+        self.latencies = {}  # 请求类型 -> 最近成功请求的延迟
+        self.window = window
+        self.hedged = 0
+        self._lock = threading.Lock()
+
+    @property
+    def primary(self):
+        return self.endpoints[0]
+
+    def healthy_endpoints(self):
+        """未在冷却中的端点（按配置顺序）；全部冷却时仍返回全部，保证总有端点可用"""
+        now = time.time()
+        with self._lock:
+            healthy = [endpoint for endpoint in self.endpoints if endpoint.cooldown_until <= now]
+        return healthy or list(self.endpoints)
+
+    def hedge_delay(self, kind):
+        """对冲等待时间：该类请求最近延迟的 p95，样本不足时使用最小值"""
+        with self._lock:
+            values = list(self.latencies.get(kind, ()))
+        if len(values) < 10:
+            return self.hedge_min_delay
+        return max(self.hedge_min_delay, percentile(values, 95))
+
+    def _record_success(self, endpoint, kind, elapsed):
+        with self._lock:
+            endpoint.failures = 0
+            endpoint.successes += 1
+            self.latencies.setdefault(kind, deque(maxlen=self.window)).append(elapsed)
+
+    def _record_failure(self, endpoint, error):
+        with self._lock:
+            endpoint.failures += 1
+            endpoint.errors += 1
+            if endpoint.failures >= self.failure_threshold:
+                endpoint.cooldown_until = time.time() + self.cooldown
+                endpoint.failures = 0
+                print(f"⚠️  端点 {endpoint.name} 连续失败，冷却 {self.cooldown:.0f}s: {error}")
+
+    async def _attempt(self, endpoint, request, kind):
+        start = time.perf_counter()
+        try:
+            result = await request(endpoint)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self._record_failure(endpoint, e)
+            raise
+        self._record_success(endpoint, kind, time.perf_counter() - start)
+        return result
+
+    async def call(self, request, kind="total"):
+        """调用 request(endpoint)，返回 (结果, 应答的端点)：超过对冲延迟未返回时向下一个端点发送重复请求，
+        先成功者胜出并取消其余请求；请求失败时立即切换到下一个端点"""
+        candidates = self.healthy_endpoints()
+        pending = {}
+        next_index = 0
+        last_error = None
+
+        def launch():
+            nonlocal next_index
+            endpoint = candidates[next_index]
+            next_index += 1
+            pending[asyncio.ensure_future(self._attempt(endpoint, request, kind))] = endpoint
+
+        launch()
+        try:
+            while pending:
+                can_hedge = self.hedge and next_index < len(candidates)
+                done, _ = await asyncio.wait(list(pending), timeout=self.hedge_delay(kind) if can_hedge else None,
+                                             return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    print(f"⏱️ 请求超过 {self.hedge_delay(kind) * 1000:.0f}ms 未返回，"
+                          f"对冲到端点 {candidates[next_index].name}")
+                    self.hedged += 1
+                    launch()
+                    continue
+
+                winner = None
+                for task in done:
+                    endpoint = pending.pop(task)
+                    try:
+                        result = task.result()
+                    except Exception as e:
+                        print(f"端点 {endpoint.name} 请求失败: {e}")
+                        last_error = e
+                        continue
+                    if winner is None:
+                        winner = (result, endpoint)
+                if winner is not None:
+                    return winner
+                if not pending and next_index < len(candidates):
+                    # 失败切换
+                    launch()
+            raise last_error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def summary_lines(self):
+        """端点状态（供性能统计窗口显示）"""
+        now = time.time()
+        lines = [f"端点（对冲 {self.hedged} 次，等待 {self.hedge_delay('total') * 1000:.0f}ms）"]
+        for endpoint in self.endpoints:
+            state = "冷却中" if endpoint.cooldown_until > now else "正常"
+            lines.append(f"  {endpoint.name:<12}{endpoint.model:<20}成功 {endpoint.successes:<5}"
+                         f"失败 {endpoint.errors:<5}{state}")
+        return lines
+
+
+# ==================== 翻译上下文 ====================
+def estimate_tokens(text):
+    """粗略估算 token 数：中日韩字符约 1 个/token，其余字符约 4 个/token"""
+    cjk = sum(1 for ch in text if '\u2e80' <= ch <= '\u9fff' or '\uac00' <= ch <= '\ud7af'
+              or '\uff00' <= ch <= '\uffef')
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+class TranslationContext:
+    """最近 N 组原文/译文的滚动上下文，按 token 预算从最旧的开始裁剪"""
+
+    def __init__(self, max_pairs=CONTEXT_NUM, max_tokens=CONTEXT_MAX_TOKENS):
+        self.max_tokens = max_tokens
+        self.history = deque(maxlen=max(0, max_pairs))
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _pair_messages(user_content, translation):
+        return [
+            {"role": "user", "content": user_content},
+            {"role": "assistant", "content": translation}
+        ]
+
+    def add(self, user_content, translation):
+        """记录一组已发送的用户消息及其译文"""
+        if self.history.maxlen == 0:
+            return
+        tokens = estimate_tokens(user_content) + estimate_tokens(translation)
+        with self._lock:
+            self.history.append((user_content, translation, tokens))
+            total = sum(item[2] for item in self.history)
+            while self.history and total > self.max_tokens:
+                total -= self.history.popleft()[2]
+
+    def messages(self):
+        """按时间顺序返回历史消息；历史消息内容与当初发送的完全一致，便于服务端前缀缓存"""
+        with self._lock:
+            history = list(self.history)
+        messages = []
+        for user_content, translation, _ in history:
+            messages.extend(self._pair_messages(user_content, translation))
+        return messages
+
+    def clear(self):
+        with self._lock:
+            self.history.clear()
+
+
+# ==================== 性能追踪 ====================
+def percentile(values, pct):
+    """线性插值计算百分位数"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * pct / 100
+    lower = int(k)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (k - lower)
+
+
+class CycleTrace:
+    """一次截图/翻译周期中各阶段的耗时"""
+
+    def __init__(self, tracer, cycle_id, kind):
+        self.tracer = tracer
+        self.cycle_id = cycle_id
+        self.kind = kind
+        self.timestamp = time.time()
+        self.started = time.perf_counter()
+        self.excluded = 0.0  # 不计入总耗时的等待（如用户拖选区域）
+        self._paused_at = None
+        self.stages = {}
+        self.meta = {}
+        self.finished = False
+
+    def pause(self):
+        """开始等待用户操作，等待时间不计入总耗时"""
+        if self._paused_at is None:
+            self._paused_at = time.perf_counter()
+
+    def resume(self):
+        if self._paused_at is not None:
+            self.excluded += time.perf_counter() - self._paused_at
+            self._paused_at = None
+
+    def elapsed(self):
+        """从周期开始到现在的实际耗时（扣除用户等待）"""
+        self.resume()
+        return time.perf_counter() - self.started - self.excluded
+
+    def add(self, name, seconds):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    @contextmanager
+    def stage(self, name):
+        """计时一个阶段：with trace.stage("preprocess"): ..."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def finish(self):
+        """结束本周期并提交记录（只提交一次）"""
+        if not self.finished:
+            self.finished = True
+            self.stages["total"] = self.elapsed()
+            self.tracer.record(self)
+
+
+class LatencyTracer:
+    """汇总每个周期的阶段耗时：内存中保留滚动窗口用于百分位统计，可追加导出 JSONL"""
+
+    def __init__(self, trace_file=TRACE_FILE, window=TRACE_WINDOW):
+        self.trace_file = trace_file
+        self.window = window
+        self.samples = {}  # 阶段 -> 最近的耗时
+        self.sums = {}  # 阶段 -> 累计耗时（指标接口使用）
+        self.counts = {}  # 阶段 -> 累计次数
+        self.cycles = 0
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.metrics_server = None
+
+    def new_cycle(self, kind):
+        with self._lock:
+            self._next_id += 1
+            return CycleTrace(self, self._next_id, kind)
+
+    def record(self, trace):
+        # total 为端到端的实际耗时（在 finish 时记录）：子阶段（ocr:方案）和并行的预览不会重复计入
+        stages = dict(trace.stages)
+        with self._lock:
+            self.cycles += 1
+            for name, seconds in stages.items():
+                self.samples.setdefault(name, deque(maxlen=self.window)).append(seconds)
+                self.sums[name] = self.sums.get(name, 0.0) + seconds
+                self.counts[name] = self.counts.get(name, 0) + 1
+
+        if self.trace_file:
+            entry = {
+                "cycle": trace.cycle_id,
+                "kind": trace.kind,
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(trace.timestamp)),
+                "stages_ms": {name: round(seconds * 1000, 3) for name, seconds in stages.items()},
+                **trace.meta
+            }
+            try:
+                with open(self.trace_file, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            except OSError as e:
+                print(f"写入追踪记录失败: {e}")
+
+    def summary(self):
+        """返回 {阶段: (p50, p95, p99, 样本数)}，单位秒"""
+        with self._lock:
+            samples = {name: list(values) for name, values in self.samples.items()}
+        return {name: (percentile(values, 50), percentile(values, 95), percentile(values, 99), len(values))
+                for name, values in samples.items()}
+
+    def prometheus_text(self):
+        """Prometheus 文本格式的指标"""
+        summary = self.summary()
+        with self._lock:
+            sums = dict(self.sums)
+            counts = dict(self.counts)
+            cycles = self.cycles
+        lines = ["# HELP game_translator_stage_seconds Per-stage latency of capture/translation cycles",
+                 "# TYPE game_translator_stage_seconds summary"]
+        for name, (p50, p95, p99, _) in sorted(summary.items()):
+            for quantile, value in (("0.5", p50), ("0.95", p95), ("0.99", p99)):
+                lines.append(f'game_translator_stage_seconds{{stage="{name}",quantile="{quantile}"}} {value:.6f}')
+            lines.append(f'game_translator_stage_seconds_sum{{stage="{name}"}} {sums[name]:.6f}')
+            lines.append(f'game_translator_stage_seconds_count{{stage="{name}"}} {counts[name]}')
+        lines.append("# HELP game_translator_cycles_total Completed capture/translation cycles")
+        lines.append("# TYPE game_translator_cycles_total counter")
+        lines.append(f"game_translator_cycles_total {cycles}")
+        return "\n".join(lines) + "\n"
+
+    def start_metrics_server(self, port, host="127.0.0.1"):
+        """在本地端口提供 /metrics 接口"""
+        self.metrics_server = ThreadingHTTPServer((host, port), MetricsHandler)
+        self.metrics_server.daemon_threads = True
+        self.metrics_server.tracer = self
+        threading.Thread(target=self.metrics_server.serve_forever, daemon=True).start()
+        print(f"✅ 性能指标接口: http://{host}:{port}/metrics")
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    """Prometheus 风格的 /metrics 接口"""
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.rstrip('/') != '/metrics':
+            self.send_error(404)
+            return
+        payload = self.server.tracer.prometheus_text().encode('utf-8')
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+# ==================== 翻译服务 ====================
+class TranslationService:
+    """与界面无关的翻译核心：缓存 → 翻译记忆 → 分块 / 批量 / 单段请求（多端点），由调度器驱动
+
+    界面和离线基准测试走同一条路径。界面相关的显示通过回调完成（在事件循环线程中调用）：
+    on_provisional(序号, 译文, 相似度)、on_partial(序号, 已完成部分, 完成块数, 总块数)；
+    stream_sink(序号) 返回接收流式片段的对象（push / close），为 None 时流式请求不显示。
+    """
+
+    def __init__(self, on_result, on_depth=None, endpoint_pool=None, cache=None, memory=None, context=None,
+                 stream=STREAM_OUTPUT, stream_sink=None, on_provisional=None, on_partial=None,
+                 batch_window_ms=BATCH_WINDOW_MS, cancel_stale=CANCEL_STALE_REQUESTS,
+                 max_concurrency=MAX_CONCURRENT_REQUESTS, max_queue=TRANSLATION_QUEUE_SIZE):
+        self.endpoint_pool = endpoint_pool if endpoint_pool is not None else EndpointPool(load_endpoints())
+        self.cache = cache if cache is not None else TranslationCache()
+        self.memory = memory
+        self.context = context if context is not None else TranslationContext()
+        self.stream = stream
+        self.stream_sink = stream_sink
+        self.on_provisional = on_provisional
+        self.on_partial = on_partial
+        # 翻译调度器：新请求使旧请求过期，限制并发。批量翻译：调度队列中的短文本合并发送；
+        # 新请求取消旧请求时同等优先级的请求不会重叠，凑不成批量，只会白等窗口时间，因此不启用
+        batching = batch_window_ms > 0 and not cancel_stale
+        self.scheduler = TranslationScheduler(
+            self.translate, on_result, on_depth, max_concurrency=max_concurrency, cancel_stale=cancel_stale,
+            max_queue=max_queue, estimate=self._estimate_request,
+            translate_many=self.translate_many if batching else None, batch_window_ms=batch_window_ms)
+
+    def submit(self, text, priority=PRIORITY_MANUAL):
+        """（任意线程）提交一段原文，返回 (序号, 缓存的译文)
+
+        缓存命中时直接返回译文，并使之前同等或更低优先级的请求过期；否则交给调度器，译文为 None。
+        """
+        cached = self.cache.get(text)
+        if cached is not None:
+            seq = self.scheduler.supersede(priority)
+            self.context.add(make_user_content(text), cached)
+            return seq, cached
+        return self.scheduler.submit(text, priority), None
+
+    async def translate(self, clean_text, seq):
+        """（事件循环线程）翻译一段文本并记录缓存与上下文，返回 (译文, 延迟, 翻译记忆相似度)"""
+        match = await self._memory_match(clean_text, seq)
+        if match is not None:
+            return match
+
+        chunks = split_into_chunks(clean_text)
+        if len(chunks) > 1:
+            result, latency, model = await self._translate_chunked(chunks, seq)
+        else:
+            result, latency, model = await self._translate_single(clean_text, seq)
+        self._record(clean_text, result, latency, model)
+        return result, latency, None
+
+    async def translate_many(self, texts, seqs):
+        """（事件循环线程）调度器合并的多段文本：各段先查翻译记忆，其余合并为一次请求，返回各段的结果"""
+        results = [await self._memory_match(text, seq) for text, seq in zip(texts, seqs)]
+        todo = [i for i, result in enumerate(results) if result is None]
+        if len(todo) == 1:
+            translated = [await self._translate_single(texts[todo[0]], seqs[todo[0]])]
+        elif todo:
+            try:
+                translated = await self._translate_batch([texts[i] for i in todo])
+                print(f"批量翻译 {len(todo)} 段，合并为 1 次请求")
+            except Exception as e:
+                if is_retryable_error(e):
+                    raise  # 由调度器整批退避重试
+                # 译文编号不完整等情况改为逐条请求，每条单独经过限流
+                print(f"批量翻译失败，改为逐条请求: {e}")
+                translated = [await self._translate_single(texts[i], seqs[i], stream=False, charged=False)
+                              for i in todo]
+        for i, (result, latency, model) in zip(todo, translated):
+            self._record(texts[i], result, latency, model)
+            results[i] = (result, latency, None)
+        return results
+
+    async def _memory_match(self, clean_text, seq):
+        """近似原文（OCR 噪声只差个别字符）直接复用译文，返回 (译文, None, 相似度)；查询在线程池中执行"""
+        if self.memory is None:
+            return None
+        match = await asyncio.get_running_loop().run_in_executor(None, self.memory.lookup, clean_text)
+        if match is None:
+            return None
+        similarity, _, translation = match
+        if similarity >= self.memory.threshold:
+            self.context.add(make_user_content(clean_text), translation)
+            return translation, None, similarity
+        # 相似度不够高：先显示相似原文的译文，准确翻译到达后覆盖
+        if self.on_provisional is not None:
+            self.on_provisional(seq, translation, similarity)
+        return None
+
+    def _record(self, clean_text, result, latency, model):
+        """记录一次翻译的延迟，并写入缓存、翻译记忆和上下文"""
+        ttft, total_time = latency
+        print(f"翻译请求 首字 {ttft * 1000:.0f}ms，总计 {total_time * 1000:.0f}ms")
+
+        if result:
+            # 按实际应答的模型写入缓存；各块来自不同模型的长文本只缓存各块
+            if model is not None:
+                self.cache.put(clean_text, result, model)
+            if self.memory is not None and model == MODEL_NAME:
+                self.memory.add(clean_text, result)
+            self.context.add(make_user_content(clean_text), result)
+
+    def _build_messages(self, user_content):
+        return build_messages(user_content, self.context.messages())
+
+    @staticmethod
+    def _estimate_request(text):
+        """调度器限流用的 token 估算；分块翻译的长文本返回 None，由每一块分别占用配额"""
+        if len(split_into_chunks(text)) > 1:
+            return None
+        return estimate_request_tokens(text)
+
+    async def _complete(self, messages, max_tokens, tokens, charged=False):
+        """非流式请求，返回 (译文, 应答的模型)；译文被截断（finish_reason 为 length）时按 COMPLETION_MAX_TOKENS 重试一次
+
+        每次 API 调用前按 tokens 经过限流；charged 表示调度器已为第一次调用占用了配额。
+        """
+        while True:
+            if not charged:
+                await self.scheduler.acquire(tokens)
+            charged = False
+            response, endpoint = await self.endpoint_pool.call(lambda endpoint: endpoint.client.chat.completions.create(
+                model=endpoint.model,
+                messages=messages,
+                temperature=TEMPERATURE,
+                max_tokens=max_tokens,
+                stream=False
+            ))
+            choice = response.choices[0]
+            if choice.finish_reason != "length" or max_tokens >= COMPLETION_MAX_TOKENS:
+                return choice.message.content or "", endpoint.model
+            print(f"译文超过 max_tokens={max_tokens} 被截断，按上限 {COMPLETION_MAX_TOKENS} 重试")
+            max_tokens = COMPLETION_MAX_TOKENS
+
+    async def _translate_single(self, clean_text, seq=None, stream=None, charged=True):
+        """翻译单段文本，返回 (译文, (首字延迟, 总延迟), 应答的模型)
+
+        charged 表示调度器已为第一次调用占用了配额；重新请求时再次经过限流。
+        """
+        if stream is None:
+            stream = self.stream
+        messages = self._build_messages(make_user_content(clean_text))
+
+        tokens = estimate_request_tokens(clean_text)
+        max_tokens = completion_max_tokens(clean_text)
+        start = time.perf_counter()
+        if stream:
+            if not charged:
+                await self.scheduler.acquire(tokens)
+            result, first_token_time, finish_reason, model = await self._stream_completion(messages, seq, max_tokens)
+            if finish_reason == "length" and max_tokens < COMPLETION_MAX_TOKENS:
+                # 估算的 max_tokens 不够：按上限重新请求完整译文，避免截断的译文进入缓存
+                result, model = await self._complete(messages, COMPLETION_MAX_TOKENS, tokens)
+        else:
+            result, model = await self._complete(messages, max_tokens, tokens, charged=charged)
+            first_token_time = None
+        total_time = time.perf_counter() - start
+        # 非流式请求的首字延迟即总延迟
+        ttft = total_time if first_token_time is None else first_token_time - start
+        return result, (ttft, total_time), model
+
+    async def _translate_batch(self, texts):
+        """一次请求翻译多段文本（配额已由调度器按整批占用），按编号拆分后返回 [(译文, 延迟, 应答的模型), ...]"""
+        messages = self._build_messages(build_batch_prompt(texts))
+
+        start = time.perf_counter()
+        response, endpoint = await self.endpoint_pool.call(lambda endpoint: endpoint.client.chat.completions.create(
+            model=endpoint.model,
+            messages=messages,
+            temperature=TEMPERATURE,
+            max_tokens=min(4096, sum(completion_max_tokens(text) for text in texts)),
+            stream=False
+        ), kind="batch")
+        total_time = time.perf_counter() - start
+        results = split_batch_reply(response.choices[0].message.content, len(texts))
+        return [(result, (total_time, total_time), endpoint.model) for result in results]
+
+    async def _translate_chunked(self, chunks, seq):
+        """长文本分块并发翻译：每块完成后立即按原顺序显示已完成的部分，返回 (拼接后的译文, 延迟, 应答的模型)
+
+        各块使用相同的上下文前缀；已缓存的块不再请求。每次 API 调用（包括截断后的重试）单独经过限流，
+        同时进行的块数不超过调度器的并发上限。
+        """
+        history = self.context.messages()
+        semaphore = asyncio.Semaphore(max(1, min(CHUNK_CONCURRENCY, self.scheduler.max_concurrency)))
+        translations = [None] * len(chunks)
+        models = set()
+        start = time.perf_counter()
+        first_done = None
+
+        async def translate_chunk(index, text):
+            nonlocal first_done
+            translation = self.cache.get(text)
+            model = MODEL_NAME
+            if translation is None:
+                messages = build_messages(make_user_content(text), history)
+                async with semaphore:
+                    translation, model = await self._complete(messages, completion_max_tokens(text),
+                                                              estimate_request_tokens(text))
+                self.cache.put(text, translation, model)
+            models.add(model)
+            if first_done is None:
+                first_done = time.perf_counter()
+            translations[index] = translation
+            partial = stitch_chunks(chunks, translations)
+            done = sum(1 for item in translations if item is not None)
+            if self.on_partial is not None:
+                self.on_partial(seq, partial, done, len(chunks))
+
+        tasks = [asyncio.ensure_future(translate_chunk(index, text)) for index, (text, _) in enumerate(chunks)]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            # 任意一块失败或请求被取消时，取消其余的块
+            for task in tasks:
+                task.cancel()
+            raise
+        total_time = time.perf_counter() - start
+        # 各块来自不同模型时整段不对应任何一个模型
+        model = models.pop() if len(models) == 1 else None
+        return stitch_chunks(chunks, translations), (first_done - start, total_time), model
+
+    @staticmethod
+    async def _open_stream(endpoint, messages, max_tokens=COMPLETION_MAX_TOKENS):
+        """打开流式请求并等到第一个非空片段，返回 (stream, 片段迭代器, 首个片段)
+
+        对冲时以首个片段到达为“返回”，落败的流在取消时关闭。
+        """
+        stream = await endpoint.client.chat.completions.create(
+            model=endpoint.model,
+            messages=messages,
+            temperature=TEMPERATURE,
+            max_tokens=max_tokens,
+            stream=True
+        )
+        try:
+            iterator = stream.__aiter__()
+            while True:
+                try:
+                    chunk = await iterator.__anext__()
+                except StopAsyncIteration:
+                    return stream, iterator, ""
+                if chunk.choices and chunk.choices[0].delta.content:
+                    return stream, iterator, chunk.choices[0].delta.content
+        except BaseException:
+            await stream.close()
+            raise
+
+    async def _stream_completion(self, messages, seq, max_tokens=COMPLETION_MAX_TOKENS):
+        """流式请求，边接收边交给 stream_sink 显示；返回 (完整文本, 首个 token 到达时间, finish_reason, 应答的模型)"""
+        renderer = self.stream_sink(seq) if self.stream_sink is not None else None
+        pieces = []
+        first_token_time = None
+        finish_reason = None
+        stream = None
+        try:
+            (stream, iterator, first_piece), endpoint = await self.endpoint_pool.call(
+                lambda endpoint: self._open_stream(endpoint, messages, max_tokens), kind="ttft")
+            if first_piece:
+                first_token_time = time.perf_counter()
+                pieces.append(first_piece)
+                if renderer is not None:
+                    renderer.push(first_piece)
+            async for chunk in iterator:
+                if not chunk.choices:
+                    continue
+                finish_reason = chunk.choices[0].finish_reason or finish_reason
+                piece = chunk.choices[0].delta.content
+                if not piece:
+                    continue
+                if first_token_time is None:
+                    first_token_time = time.perf_counter()
+                pieces.append(piece)
+                if renderer is not None:
+                    renderer.push(piece)
+        finally:
+            if renderer is not None:
+                renderer.close()
+            if stream is not None:
+                # 请求被取消时及时释放连接
+                await stream.close()
+        return ''.join(pieces), first_token_time, finish_reason, endpoint.model
+
+
+# ==================== 主窗口 ====================
 class GameTranslationAssistant:
     def __init__(self):
-        # 检查 Tesseract OCR 是否可用
-        self.ocr_available = self.check_tesseract_available()
+        # OCR 后端（优先使用常驻的 tesserocr 引擎）
+        self.ocr_backend = create_ocr_backend()
+
+        # Tesseract OCR 是否可用：None 表示后台检查尚未完成
+        self.ocr_available = None
 
         self.root = tk.Tk()
         self.root.title("🎮 游戏翻译助手")
@@ -163,23 +2795,64 @@ class GameTranslationAssistant:
 
         self.root.geometry(f"{self.window_width}x{self.window_height}+{self.x_position}+{self.y_position}")
 
-        # 初始化客户端
-        try:
-            self.client = OpenAI(
-                api_key=API_KEY,
-                base_url=API_ADDRESS,
-                timeout=30
-            )
-        except Exception as e:
-            messagebox.showerror("初始化失败", f"DeepSeek 客户端初始化失败:\n{e}")
-            self.status_var = tk.StringVar(value="⚠️ API 初始化失败")
-            self.setup_ui()
-            return
-
-        self.is_selecting = False
-        self.selection_start = None
-        self.selection_rect = None
-        self.screenshot_img = None  # 保存原始截图
+        self.selection_overlay = None  # 截图选区窗口
+        self.screenshot_img = None  # 保存原始截图（BGRA）
+        self._screen_capture = None  # 复用的截图句柄（主线程，首次截图时创建）
+        self.last_region = None  # 最近一次选择的屏幕区域
+        self.last_region_profile = ""  # 最近一次区域使用的 OCR 配置档（保存的区域可以指定）
+        self.region_store = RegionStore()
+        self.region_hotkeys = []  # 已绑定的区域热键序列
+        self.region_window = None
+        self.region_watcher = None  # 区域监视器
+
+        self.last_ocr_text = ""
+
+        # OCR 并行执行器
+        self.ocr_executor = OCRExecutor(self.ocr_backend)
+
+        # OCR 配置档：按游戏记录各方案胜率，决定方案顺序
+        self.ocr_profiles = OCRProfileStore()
+        self.ocr_profile = self.ocr_profiles.get(OCR_PROFILE)
+
+        # 截图 → 预处理 → OCR 流水线（界面线程只提交任务、定时取结果）
+        self.pipeline = CapturePipeline(self.ocr_executor, self.ocr_profiles, lambda: self.ocr_profile)
+
+        # 翻译服务：缓存、翻译记忆、滚动上下文、批量与调度（API 客户端在首次使用或后台预热时创建）
+        self.translation_memory = TranslationMemory() if TRANSLATION_MEMORY else None
+        self.translation_service = TranslationService(
+            self._on_translation_done, self._on_queue_depth, memory=self.translation_memory,
+            stream_sink=lambda seq: StreamRenderer(self.root, self.output_text, lambda: seq == self.displayed_seq),
+            on_provisional=lambda seq, translation, similarity: self.root.after(
+                0, lambda: self._show_provisional(seq, translation, similarity)),
+            on_partial=lambda seq, partial, done, total: self.root.after(
+                0, lambda: self._show_partial_translation(seq, partial, done, total)))
+        self.endpoint_pool = self.translation_service.endpoint_pool
+        self.translation_cache = self.translation_service.cache
+        self.translation_context = self.translation_service.context
+        self.translation_scheduler = self.translation_service.scheduler
+
+        # 模糊翻译记忆（后台从缓存数据库建立索引）
+        if self.translation_memory is not None:
+            threading.Thread(target=self.translation_memory.load, args=(self.translation_cache,),
+                             daemon=True).start()
+
+        # 最近请求的延迟记录：(首字延迟, 总延迟)，单位秒
+        self.request_latencies = deque(maxlen=100)
+
+        self.displayed_seq = 0  # 当前已显示结果的请求序号
+        self.displayed_priority = PRIORITY_MANUAL  # 当前已显示结果的请求优先级
+        self.queue_depth = 0
+
+        # 性能追踪：各阶段耗时统计
+        self.tracer = LatencyTracer()
+        if METRICS_PORT:
+            try:
+                self.tracer.start_metrics_server(METRICS_PORT)
+            except OSError as e:
+                print(f"⚠️  警告: 无法启动性能指标接口: {e}")
+        self.capture_trace = None  # 当前截图周期的追踪记录
+        self.pending_traces = {}  # 请求序号 -> 追踪记录
+        self.stats_window = None
 
         # 窗口调整大小相关变量
         self.resizing = False
@@ -194,12 +2867,75 @@ class GameTranslationAssistant:
         # 应用初始主题和字体设置
         self.apply_theme_and_font()
 
+        # 窗口显示后再在后台导入重型模块、检查 OCR 和 API
+        threading.Thread(target=self._startup_checks, daemon=True).start()
+        self.root.after(PIPELINE_PUMP_MS, self._pump_pipeline)
+
+    @property
+    def screen_capture(self):
+        if self._screen_capture is None:
+            self._screen_capture = ScreenCapture()
+        return self._screen_capture
+
+    def _startup_checks(self):
+        """（后台线程）预热重型模块，检查 Tesseract 和 API，结果显示在状态栏"""
+        start = time.perf_counter()
+        for module in WARM_UP_MODULES:
+            try:
+                module.load()
+            except Exception as e:
+                print(f"⚠️  警告: 导入 {module.module_name} 失败: {e}")
+        print(f"✅ 模块预热完成，用时 {(time.perf_counter() - start) * 1000:.0f}ms")
+
+        # 检查 Tesseract OCR 是否可用
+        ocr_available = self.check_tesseract_available()
+        self.root.after(0, lambda: self._on_ocr_check(ocr_available))
+
+        api_error = self.check_api_available()
+        self.root.after(0, lambda: self._on_api_check(api_error))
+
+    def _ready_text(self):
+        if self.ocr_available is False:
+            return "就绪 - OCR未正确配置，只能手动输入"
+        return "就绪 - 按F10截图或手动输入"
+
+    def _on_ocr_check(self, ocr_available):
+        self.ocr_available = ocr_available
+        if not ocr_available:
+            # 如果 OCR 不可用，显示警告
+            self.ocr_warning_frame.pack(fill=tk.X, pady=(0, 5), before=self.hotkey_label)
+        self.status_var.set(self._ready_text())
+
+    def _on_api_check(self, api_error):
+        if api_error:
+            self.status_var.set(api_error)
+        elif self.status_var.get().startswith(("就绪", "⏳")):
+            # 用户尚未开始操作时才覆盖状态栏
+            self.status_var.set(f"{self._ready_text()} | ✅ API 连接正常")
+
+    def check_api_available(self):
+        """检查 API Key 和服务连通性，正常返回 None，否则返回状态栏错误信息"""
+        if not API_KEY:
+            print("❌ 错误：config.ini 中的 api_key 为空！")
+            print("请前往 https://platform.deepseek.com/ 获取 API Key 并填入 config.ini")
+            return "❌ config.ini 中的 api_key 为空，无法翻译"
+
+        async def ping():
+            await self.endpoint_pool.primary.client.models.list(timeout=10)
+
+        try:
+            asyncio.run_coroutine_threadsafe(ping(), self.translation_scheduler.loop).result()
+        except Exception as e:
+            print(f"⚠️  API 连接检查失败: {e}")
+            return f"⚠️ API 连接检查失败：{e}"
+        return None
+
     def check_tesseract_available(self):
         """检查 Tesseract OCR 是否可用"""
         try:
             # 尝试获取 Tesseract 版本
-            version = pytesseract.get_tesseract_version()
-            print(f"✅ Tesseract OCR 版本: {version}")
+            version = self.ocr_backend.version()
+            print(f"✅ Tesseract OCR 版本: {version}（{self.ocr_backend.name}）")
             return True
         except Exception as e:
             print(f"❌ Tesseract OCR 不可用: {e}")
@@ -235,6 +2971,10 @@ class GameTranslationAssistant:
         hide_button = tk.Button(self.title_bar, text="−", width=2, command=self.hide_window, bd=0, font=("Arial", 12))
         hide_button.pack(side=tk.RIGHT, padx=5)
 
+        # 保存的截图区域
+        self.region_button = tk.Button(self.title_bar, text="📌 区域", command=self.show_region_menu, bd=0)
+        self.region_button.pack(side=tk.RIGHT, padx=5)
+
         # 绑定标题栏拖动事件
         self.title_bar.bind("<ButtonPress-1>", self.start_move)
         self.title_bar.bind("<B1-Motion>", self.do_move)
@@ -245,15 +2985,14 @@ class GameTranslationAssistant:
         main_frame = tk.Frame(self.main_container)
         main_frame.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
 
-        # 如果 OCR 不可用，显示警告
-        if not self.ocr_available:
-            warning_frame = tk.Frame(main_frame)
-            warning_frame.pack(fill=tk.X, pady=(0, 5))
-            tk.Label(warning_frame,
-                     text="⚠️ OCR未正确配置 - 截图功能可能无法识别文字",
-                     font=(self.current_font_family, 9, "bold")).pack(fill=tk.X)
+        # OCR 不可用时的警告（后台检查完成后才显示）
+        self.ocr_warning_frame = tk.Frame(main_frame)
+        tk.Label(self.ocr_warning_frame,
+                 text="⚠️ OCR未正确配置 - 截图功能可能无法识别文字",
+                 font=(self.current_font_family, 9, "bold")).pack(fill=tk.X)
 
-        tk.Label(main_frame, text="📸 F10: 截图翻译 | ✏️ 手动输入 | F9: 显示/隐藏窗口").pack(anchor=tk.W, pady=(0, 5))
+        self.hotkey_label = tk.Label(main_frame, text="📸 F10: 截图翻译 | ✏️ 手动输入 | F9: 显示/隐藏窗口 | F8: 监视区域")
+        self.hotkey_label.pack(anchor=tk.W, pady=(0, 5))
 
         # 输入区域
         input_frame = tk.LabelFrame(main_frame, text="输入", padx=5, pady=5)
@@ -275,6 +3014,7 @@ class GameTranslationAssistant:
         preview_frame.pack(fill=tk.BOTH, expand=True, pady=(10, 0))
         self.preview_label = tk.Label(preview_frame, text="无截图", anchor="center")
         self.preview_label.pack(fill=tk.BOTH, expand=True)
+        self.preview_renderer = PreviewRenderer(self.root, self.preview_label)
 
         # 输出区域
         output_frame = tk.LabelFrame(main_frame, text="翻译结果", padx=5, pady=5)
@@ -284,9 +3024,7 @@ class GameTranslationAssistant:
         self.output_text.pack(fill=tk.BOTH, expand=True)
 
         # 状态栏
-        self.status_var = tk.StringVar(value="就绪 - 按F10截图或手动输入")
-        if not self.ocr_available:
-            self.status_var.set("就绪 - OCR未正确配置，只能手动输入")
+        self.status_var = tk.StringVar(value="⏳ 正在加载 OCR 与翻译组件...")
 
         self.status_label = tk.Label(main_frame, textvariable=self.status_var, relief=tk.SUNKEN,
                                      anchor=tk.W, padx=5, font=(self.current_font_family, 9))
@@ -309,12 +3047,12 @@ class GameTranslationAssistant:
         """显示设置窗口"""
         self.settings_window = tk.Toplevel(self.root)
         self.settings_window.title("设置")
-        self.settings_window.geometry("400x300")
+        self.settings_window.geometry("400x370")
         self.settings_window.resizable(False, False)
         self.settings_window.wm_attributes("-topmost", True)
 
         # 使设置窗口居中
-        self.center_window(self.settings_window, 400, 300)
+        self.center_window(self.settings_window, 400, 370)
 
         # 创建设置界面
         settings_frame = tk.Frame(self.settings_window, padx=20, pady=20)
@@ -361,6 +3099,17 @@ class GameTranslationAssistant:
         font_family_dropdown.bind("<<ComboboxSelected>>", self.update_font_preview)
         font_size_dropdown.bind("<<ComboboxSelected>>", self.update_font_preview)
 
+        # OCR 配置档（每个游戏一个，可直接输入新名称）
+        profile_frame = tk.LabelFrame(settings_frame, text="OCR 配置档", padx=10, pady=10)
+        profile_frame.pack(fill=tk.X, pady=(0, 10))
+
+        tk.Label(profile_frame, text="游戏:").grid(row=0, column=0, sticky=tk.W, padx=(0, 10))
+
+        self.ocr_profile_var = tk.StringVar(value=self.ocr_profile.name)
+        profile_dropdown = ttk.Combobox(profile_frame, textvariable=self.ocr_profile_var,
+                                        values=self.ocr_profiles.names(), width=20)
+        profile_dropdown.grid(row=0, column=1, sticky=tk.W)
+
         # 按钮区域
         button_frame = tk.Frame(settings_frame)
         button_frame.pack(fill=tk.X, pady=(10, 0))
@@ -371,6 +3120,64 @@ class GameTranslationAssistant:
         cancel_button = tk.Button(button_frame, text="取消", command=self.settings_window.destroy, width=10)
         cancel_button.pack(side=tk.RIGHT)
 
+        stats_button = tk.Button(button_frame, text="📊 性能统计", command=self.show_stats_window)
+        stats_button.pack(side=tk.LEFT)
+
+    def show_stats_window(self):
+        """显示性能统计窗口（位于设置窗口旁边）"""
+        if self.stats_window is not None and self.stats_window.winfo_exists():
+            self.stats_window.lift()
+            return
+
+        self.stats_window = tk.Toplevel(self.root)
+        self.stats_window.title("📊 性能统计")
+        self.stats_window.wm_attributes("-topmost", True)
+
+        width, height = 460, 300
+        settings = getattr(self, 'settings_window', None)
+        if settings is not None and settings.winfo_exists():
+            x = settings.winfo_x() + settings.winfo_width() + 10
+            y = settings.winfo_y()
+            self.stats_window.geometry(f"{width}x{height}+{x}+{y}")
+        else:
+            self.center_window(self.stats_window, width, height)
+
+        self.stats_text = tk.Text(self.stats_window, font=("Consolas", 9), wrap=tk.NONE, padx=10, pady=10)
+        self.stats_text.pack(fill=tk.BOTH, expand=True)
+        self.refresh_stats()
+
+    def refresh_stats(self):
+        """每秒刷新一次统计表"""
+        if self.stats_window is None or not self.stats_window.winfo_exists():
+            return
+
+        lines = [f"{'阶段':<22}{'p50(ms)':>10}{'p95(ms)':>10}{'p99(ms)':>10}{'样本':>7}"]
+        for name, (p50, p95, p99, count) in sorted(self.tracer.summary().items()):
+            lines.append(f"{name:<24}{p50 * 1000:>10.1f}{p95 * 1000:>10.1f}{p99 * 1000:>10.1f}{count:>8}")
+        lines.append("")
+        lines.append(f"已完成周期: {self.tracer.cycles}")
+        scheduler = self.translation_scheduler
+        lines.append(f"翻译请求: 进行中/排队 {self.queue_depth} 个，重试 {scheduler.retries} 次，"
+                     f"队列满丢弃 {scheduler.dropped} 个")
+        if self.request_latencies:
+            ttfts = [ttft for ttft, _ in self.request_latencies]
+            totals = [total_time for _, total_time in self.request_latencies]
+            lines.append(f"最近 {len(totals)} 次请求: 首字 p50 {percentile(ttfts, 50) * 1000:.0f}ms / "
+                         f"p95 {percentile(ttfts, 95) * 1000:.0f}ms，总计 p50 {percentile(totals, 50):.1f}s / "
+                         f"p95 {percentile(totals, 95):.1f}s")
+        if self.tracer.trace_file:
+            lines.append(f"追踪记录: {self.tracer.trace_file}")
+        lines.append("")
+        lines.extend(self.endpoint_pool.summary_lines())
+        lines.append("")
+        lines.extend(self.ocr_profile.summary_lines())
+
+        self.stats_text.config(state=tk.NORMAL)
+        self.stats_text.delete("1.0", tk.END)
+        self.stats_text.insert(tk.END, "\n".join(lines))
+        self.stats_text.config(state=tk.DISABLED)
+        self.stats_window.after(1000, self.refresh_stats)
+
     def center_window(self, window, width, height):
         """使窗口居中显示"""
         screen_width = window.winfo_screenwidth()
@@ -404,6 +3211,12 @@ class GameTranslationAssistant:
         self.current_font_family = new_font_family
         self.current_font_size = new_font_size
 
+        # 切换 OCR 配置档（识别线程在下一次识别时取用）
+        profile_name = self.ocr_profile_var.get().strip()
+        if profile_name and profile_name != self.ocr_profile.name:
+            self.ocr_profiles.save()
+            self.ocr_profile = self.ocr_profiles.get(profile_name)
+
         # 应用新的主题和字体
         self.apply_theme_and_font()
 
@@ -487,6 +3300,7 @@ class GameTranslationAssistant:
         self.root.deiconify()
         self.root.lift()
         self.root.wm_attributes("-topmost", True)
+        self.preview_renderer.flush()
         self.status_var.set("窗口已显示")
 
     def toggle_window_visibility(self):
@@ -544,11 +3358,31 @@ class GameTranslationAssistant:
 
     def setup_hotkeys(self):
         self.root.bind("<F10>", lambda e: self.start_screenshot())
+        self.root.bind("<F7>", lambda e: self.rerun_last_region())
+        self.root.bind("<F8>", lambda e: self.toggle_watch_mode())
         self.root.bind("<Escape>", lambda e: self.root.quit())
         self.root.bind("<F9>", lambda e: self.toggle_window_visibility())
+        self.bind_region_hotkeys()
+
+    def bind_region_hotkeys(self):
+        """为每个保存的区域绑定热键（区域变化后重新绑定）"""
+        for sequence in self.region_hotkeys:
+            self.root.unbind(sequence)
+        self.region_hotkeys = []
+        for name in self.region_store.names():
+            hotkey = self.region_store.get(name)["hotkey"]
+            if not hotkey:
+                continue
+            sequence = hotkey_sequence(hotkey)
+            try:
+                self.root.bind(sequence, lambda e, n=name: self.capture_saved_region(n))
+            except tk.TclError as e:
+                print(f"⚠️  警告: 区域 {name} 的热键 {hotkey} 无效: {e}")
+                continue
+            self.region_hotkeys.append(sequence)
 
     def start_screenshot(self):
-        if not self.ocr_available:
+        if self.ocr_available is False:
             messagebox.showwarning(
                 "OCR 未配置",
                 "Tesseract OCR 未正确配置，截图功能可能无法识别文字。\n\n"
@@ -565,294 +3399,1002 @@ class GameTranslationAssistant:
         self.status_var.set("准备截图...点击并拖拽选择区域")
         self.root.withdraw()
 
-        with mss.mss() as sct:
-            # 获取所有显示器的边界框
-            all_monitors = sct.monitors
-
-            # 计算所有显示器的组合边界
-            left = min(monitor['left'] for monitor in all_monitors)
-            top = min(monitor['top'] for monitor in all_monitors)
-            right = max(monitor['left'] + monitor['width'] for monitor in all_monitors)
-            bottom = max(monitor['top'] + monitor['height'] for monitor in all_monitors)
-            width = right - left
-            height = bottom - top
-
-            # 创建覆盖所有显示器的截图窗口
-            self.screenshot_window = tk.Toplevel()
-            self.screenshot_window.attributes("-alpha", 0.3)
-            self.screenshot_window.attributes("-topmost", True)
-            self.screenshot_window.overrideredirect(True)
-            self.screenshot_window.config(bg='black')
-
-            # 设置窗口位置和大小以覆盖所有显示器
-            self.screenshot_window.geometry(f"{width}x{height}+{left}+{top}")
-
-            # 截取整个虚拟屏幕
-            screenshot = sct.grab(all_monitors[0])  # monitor 0 是整个虚拟屏幕
-            self.screenshot_img = np.array(screenshot)  # 保存原始截图数据
-            img_rgb = cv2.cvtColor(self.screenshot_img, cv2.COLOR_BGRA2RGB)
-            self.fullscreen_pil = Image.fromarray(img_rgb)
-
-            self.canvas = tk.Canvas(self.screenshot_window, cursor="cross", bg="black", highlightthickness=0)
-            self.canvas.pack(fill=tk.BOTH, expand=True)
-
-            # 创建一个全尺寸的矩形来模拟透明覆盖
-            self.canvas.create_rectangle(0, 0, width, height, fill="black", stipple="gray50")
-
-            self.canvas.bind("<ButtonPress-1>", self.on_select_start)
-            self.canvas.bind("<B1-Motion>", self.on_select_motion)
-            self.canvas.bind("<ButtonRelease-1>", self.on_select_end)
-            self.canvas.bind("<Escape>", lambda e: self.cancel_screenshot())
-
-    def on_select_start(self, event):
-        self.is_selecting = True
-        self.selection_start = (event.x, event.y)
-
-    def on_select_motion(self, event):
-        if self.is_selecting and self.selection_start:
-            if self.selection_rect:
-                self.canvas.delete(self.selection_rect)
-            x0, y0 = self.selection_start
-            x1, y1 = event.x, event.y
-            self.selection_rect = self.canvas.create_rectangle(x0, y0, x1, y1, outline="red", width=2, dash=(4, 2))
-
-            # 显示选择区域的尺寸
-            self.canvas.delete("size_label")
-            width = abs(x1 - x0)
-            height = abs(y1 - y0)
-            label_x = min(x0, x1) + width / 2
-            label_y = min(y0, y1) - 20
-            if label_y < 0:
-                label_y = min(y0, y1) + height + 20
-            self.canvas.create_text(label_x, label_y,
-                                    text=f"{width} x {height}",
-                                    fill="yellow", font=("Arial", 10, "bold"),
-                                    tags="size_label")
-
-    def on_select_end(self, event):
-        if not (self.is_selecting and self.selection_start):
-            return
-
-        x0, y0 = self.selection_start
-        x1, y1 = event.x, event.y
-        left, top = min(x0, x1), min(y0, y1)
-        right, bottom = max(x0, x1), max(y0, y1)
+        capture = self.screen_capture
+
+        # 截取整个虚拟屏幕，只截取这一次，之后的选区直接从这帧中裁剪
+        self.capture_trace = self.tracer.new_cycle("capture")
+        with self.capture_trace.stage("grab"):
+            self.screenshot_img = capture.grab_virtual()
 
+        # 创建覆盖所有显示器的截图窗口
+        with self.capture_trace.stage("overlay"):
+            self.selection_overlay = SelectionOverlay(self.root, capture, self.screenshot_img,
+                                                      self.on_select_end, self.cancel_screenshot)
+        # 用户拖选区域的时间不计入总耗时
+        self.capture_trace.pause()
+
+    def on_select_end(self, left, top, right, bottom):
         if (right - left) < 10 or (bottom - top) < 10:
             self.cancel_screenshot()
             self.status_var.set("区域太小，请重新选择")
             return
 
-        # 获取虚拟屏幕的边界信息
-        with mss.mss() as sct:
-            all_monitors = sct.monitors
-            virtual_left = min(monitor['left'] for monitor in all_monitors)
-            virtual_top = min(monitor['top'] for monitor in all_monitors)
-
-        # 计算实际屏幕坐标（考虑多个显示器）
-        actual_left = virtual_left + left
-        actual_top = virtual_top + top
-        actual_right = virtual_left + right
-        actual_bottom = virtual_top + bottom
-
-        # 使用mss直接截取选定的区域 - 使用原始分辨率
-        with mss.mss() as sct:
-            monitor = {
-                "left": int(actual_left),
-                "top": int(actual_top),
-                "width": int(actual_right - actual_left),
-                "height": int(actual_bottom - actual_top)
-            }
-            screenshot = sct.grab(monitor)
-            img_array = np.array(screenshot)
-            img_rgb = cv2.cvtColor(img_array, cv2.COLOR_BGRA2RGB)
-            cropped_img = Image.fromarray(img_rgb)
-
-        # 保存原始截图用于OCR识别
-        self.original_screenshot = cropped_img.copy()
-
-        # 显示预览
-        self.show_preview(cropped_img)
-
-        # 如果OCR可用，则进行文字识别
-        if self.ocr_available:
-            self.recognize_text(cropped_img)
+        # 记录实际屏幕区域，供区域监视、重新识别和保存区域使用
+        self.last_region = self.screen_capture.to_screen_region(left, top, right, bottom)
+        self.last_region_profile = ""
+
+        # 裁剪、转换、识别全部交给流水线（从冻结的全屏截图中裁剪），覆盖窗口立即关闭
+        trace = self.capture_trace
+        self.capture_trace = None
+        trace.resume()
+        recognize = self.ocr_available is not False
+        self.pipeline.submit(PipelineJob(trace, frame=self.screenshot_img, crop=(left, top, right, bottom),
+                                         recognize=recognize))
+        self.screenshot_img = None  # 全屏截图由流水线持有，转换后释放
+
+        if recognize:
+            self.status_var.set("🔍 正在识别文字...")
         else:
             # OCR不可用，只显示预览
+            trace.finish()
             self.input_text.delete("1.0", tk.END)
             self.input_text.insert(tk.END, "⚠️ OCR未正确配置，请手动输入要翻译的文字")
             self.status_var.set("截图完成，但无法识别文字（OCR未配置）")
 
-        self.screenshot_window.destroy()
+        self.close_selection_overlay()
         self.restore_main_window()
-        self.is_selecting = False
+
+    def close_selection_overlay(self):
+        if self.selection_overlay is not None:
+            self.selection_overlay.close()
+            self.selection_overlay = None
 
     def cancel_screenshot(self):
-        if hasattr(self, 'screenshot_window'):
-            self.screenshot_window.destroy()
+        self.close_selection_overlay()
+        self.screenshot_img = None
+        self.capture_trace = None
         self.restore_main_window()
-        self.is_selecting = False
         self.status_var.set("截图已取消")
 
     def restore_main_window(self):
         self.root.deiconify()
         self.root.lift()
         self.root.wm_attributes("-topmost", True)
+        self.preview_renderer.flush()
 
-    def show_preview(self, image):
-        max_w, max_h = 300, 150
-        w, h = image.size
-        ratio = min(max_w / w, max_h / h)
-        new_size = (int(w * ratio), int(h * ratio))
-        resized = image.resize(new_size, Image.Resampling.LANCZOS)
-        self.preview_tk = ImageTk.PhotoImage(resized)
-        self.preview_label.config(image=self.preview_tk, text="")
-        self.preview_label.image = self.preview_tk
-
-    def preprocess_image(self, image):
-        """改进的图像预处理"""
-        img = np.array(image)
+    # --- 保存的截图区域 ---
+    def capture_region(self, region, profile="", label="上次区域"):
+        """直接截取已知的屏幕区域并识别：不显示覆盖窗口、不截全屏、不隐藏主窗口"""
+        if self.ocr_available is False:
+            self.status_var.set("⚠️ OCR未配置，无法识别区域文字")
+            return
+        self.last_region = region
+        self.last_region_profile = profile
+        self.status_var.set(f"🔍 正在识别{label}...")
+        self.pipeline.submit(PipelineJob(self.tracer.new_cycle("region"), region=region, profile=profile))
+
+    def capture_saved_region(self, name):
+        entry = self.region_store.get(name)
+        if entry is not None:
+            self.capture_region(entry["region"], entry["profile"], f"区域「{name}」")
+
+    def rerun_last_region(self):
+        """重新截取并识别最近一次的区域"""
+        if self.last_region is None:
+            self.status_var.set("请先按F10选择区域")
+            return
+        self.capture_region(self.last_region, self.last_region_profile)
+
+    def show_region_menu(self):
+        """标题栏“区域”按钮的下拉菜单：保存当前区域、识别或删除已保存的区域"""
+        menu = Menu(self.root, tearoff=0)
+        state = tk.NORMAL if self.last_region is not None else tk.DISABLED
+        menu.add_command(label="保存当前区域...", command=self.show_save_region_window, state=state)
+        menu.add_command(label="重新识别上次区域 (F7)", command=self.rerun_last_region, state=state)
+
+        names = self.region_store.names()
+        if names:
+            menu.add_separator()
+            remove_menu = Menu(menu, tearoff=0)
+            for name in names:
+                hotkey = self.region_store.get(name)["hotkey"]
+                label = f"{name}  [{hotkey}]" if hotkey else name
+                menu.add_command(label=label, command=lambda n=name: self.capture_saved_region(n))
+                remove_menu.add_command(label=name, command=lambda n=name: self.remove_region(n))
+            menu.add_cascade(label="删除区域", menu=remove_menu)
+
+        button = self.region_button
+        menu.tk_popup(button.winfo_rootx(), button.winfo_rooty() + button.winfo_height())
+
+    def show_save_region_window(self):
+        """把最近一次的区域保存为命名区域"""
+        if self.last_region is None:
+            return
+        if self.region_window is not None and self.region_window.winfo_exists():
+            self.region_window.destroy()
+
+        self.region_window = tk.Toplevel(self.root)
+        self.region_window.title("保存区域")
+        self.region_window.resizable(False, False)
+        self.region_window.wm_attributes("-topmost", True)
+        self.center_window(self.region_window, 320, 200)
+
+        frame = tk.Frame(self.region_window, padx=20, pady=15)
+        frame.pack(fill=tk.BOTH, expand=True)
+
+        region = self.last_region
+        tk.Label(frame, text=f"区域: {region['width']}x{region['height']} @ ({region['left']}, {region['top']})"
+                 ).grid(row=0, column=0, columnspan=2, sticky=tk.W, pady=(0, 10))
+
+        tk.Label(frame, text="名称:").grid(row=1, column=0, sticky=tk.W, padx=(0, 10), pady=(0, 5))
+        self.region_name_var = tk.StringVar()
+        name_entry = tk.Entry(frame, textvariable=self.region_name_var, width=22)
+        name_entry.grid(row=1, column=1, sticky=tk.W, pady=(0, 5))
+        name_entry.focus_set()
+
+        tk.Label(frame, text="热键:").grid(row=2, column=0, sticky=tk.W, padx=(0, 10), pady=(0, 5))
+        self.region_hotkey_var = tk.StringVar()
+        tk.Entry(frame, textvariable=self.region_hotkey_var, width=22).grid(row=2, column=1, sticky=tk.W, pady=(0, 5))
+
+        # 为空时跟随当前配置档
+        tk.Label(frame, text="OCR 配置档:").grid(row=3, column=0, sticky=tk.W, padx=(0, 10))
+        self.region_profile_var = tk.StringVar(value=self.last_region_profile)
+        ttk.Combobox(frame, textvariable=self.region_profile_var, values=[""] + self.ocr_profiles.names(),
+                     width=19).grid(row=3, column=1, sticky=tk.W)
+
+        button_frame = tk.Frame(frame)
+        button_frame.grid(row=4, column=0, columnspan=2, sticky=tk.E, pady=(15, 0))
+        tk.Button(button_frame, text="保存", command=self.save_region, width=8).pack(side=tk.RIGHT, padx=(5, 0))
+        tk.Button(button_frame, text="取消", command=self.region_window.destroy, width=8).pack(side=tk.RIGHT)
+
+    def save_region(self):
+        name = self.region_name_var.get().strip()
+        hotkey = self.region_hotkey_var.get().strip()
+        profile = self.region_profile_var.get().strip()
+        if not name:
+            messagebox.showwarning("保存区域", "请输入区域名称", parent=self.region_window)
+            return
 
-        # 转换为灰度图
-        if len(img.shape) == 3:
-            gray = cv2.cvtColor(img, cv2.COLOR_RGB2GRAY)
-        else:
-            gray = img
+        if hotkey:
+            sequence = hotkey_sequence(hotkey)
+            used_by = [other for other in self.region_store.names()
+                       if other != name and self.region_store.get(other)["hotkey"]
+                       and hotkey_sequence(self.region_store.get(other)["hotkey"]) == sequence]
+            if sequence in RESERVED_HOTKEYS or used_by:
+                messagebox.showwarning("保存区域", f"热键 {hotkey} 已被占用", parent=self.region_window)
+                return
+            try:
+                self.root.event_add("<<RegionHotkeyCheck>>", sequence)
+                self.root.event_delete("<<RegionHotkeyCheck>>", sequence)
+            except tk.TclError:
+                messagebox.showwarning("保存区域", f"无效的热键: {hotkey}（示例: F2、Control-1）",
+                                       parent=self.region_window)
+                return
 
-        # 方法1: 自适应阈值
-        adaptive_thresh = cv2.adaptiveThreshold(
-            gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
-            cv2.THRESH_BINARY, 11, 2
-        )
+        self.region_store.add(name, self.last_region, hotkey, profile)
+        self.last_region_profile = profile
+        self.bind_region_hotkeys()
+        self.region_window.destroy()
+        self.status_var.set(f"📌 已保存区域「{name}」" + (f"，热键 {hotkey}" if hotkey else ""))
+
+    def remove_region(self, name):
+        self.region_store.remove(name)
+        self.bind_region_hotkeys()
+        self.status_var.set(f"已删除区域「{name}」")
+
+    def toggle_watch_mode(self):
+        """开启/关闭对最近选择区域的自动监视"""
+        if self.region_watcher is not None:
+            self.region_watcher.stop()
+            self.region_watcher = None
+            self.status_var.set("已停止区域监视")
+            return
 
-        # 方法2: 大津二值化
-        _, otsu_thresh = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        if self.last_region is None:
+            self.status_var.set("请先按F10选择要监视的区域")
+            return
 
-        # 去噪
-        denoised_adaptive = cv2.medianBlur(adaptive_thresh, 3)
-        denoised_otsu = cv2.medianBlur(otsu_thresh, 3)
+        self.last_ocr_text = ""
+        self.region_watcher = RegionWatcher(self.last_region, self._on_watch_change)
+        self.region_watcher.start()
+        region = self.last_region
+        self.status_var.set(f"👁️ 正在监视区域 {region['width']}x{region['height']} - 按F8停止")
 
-        # 返回处理后的图像
-        return {
-            "adaptive": denoised_adaptive,
-            "otsu": denoised_otsu,
-            "original_gray": gray
-        }
+    def _on_watch_change(self, frame):
+        """（监视线程）区域内容变化后直接提交给流水线；识别忙时只保留最新的帧"""
+        if self.region_watcher is None:
+            return
+        self.pipeline.submit(PipelineJob(self.tracer.new_cycle("watch"), frame=frame))
 
-    def recognize_text(self, image):
+    def _pump_pipeline(self):
+        """（主线程）定时取出流水线结果：显示预览、显示识别结果并开始翻译"""
         try:
-            # 获取多种预处理后的图像
-            processed_images = self.preprocess_image(image)
-
-            best_text = ""
-            best_method = ""
-
-            # 尝试不同的预处理方法和OCR配置
-            methods = [
-                ("adaptive_eng", processed_images["adaptive"], r'--oem 3 --psm 6 -l eng'),
-                ("otsu_eng", processed_images["otsu"], r'--oem 3 --psm 6 -l eng'),
-                ("original_eng", processed_images["original_gray"], r'--oem 3 --psm 6 -l eng'),
-                # 尝试中文识别（如果有中文语言数据）
-                ("adaptive_chi_sim", processed_images["adaptive"], r'--oem 3 --psm 6 -l chi_sim'),
-                ("otsu_chi_sim", processed_images["otsu"], r'--oem 3 --psm 6 -l chi_sim'),
-            ]
-
-            for method_name, processed_img, config_str in methods:
-                try:
-                    text = pytesseract.image_to_string(processed_img, config=config_str)
-                    cleaned = ' '.join(text.strip().split())
-
-                    # 如果识别到文字且比之前的好，就更新
-                    if cleaned and len(cleaned) > len(best_text):
-                        best_text = cleaned
-                        best_method = method_name
-                        print(f"方法 {method_name} 识别到 {len(cleaned)} 个字符: {cleaned[:50]}...")
-
-                except Exception as e:
-                    print(f"方法 {method_name} 失败: {e}")
-
-            if best_text:
-                self.input_text.delete("1.0", tk.END)
-                self.input_text.insert(tk.END, best_text)
-                self.status_var.set(f"识别完成（{best_method}）：{len(best_text)}字符")
-                self.translate_text()
-            else:
-                # 如果没有识别到文字，尝试保存图像用于调试
+            for _ in range(20):
                 try:
-                    debug_path = "debug_screenshot.png"
-                    image.save(debug_path)
-                    self.status_var.set(f"未识别到有效文字，已保存到 {debug_path}")
-                    print(f"未识别到文字，截图已保存到: {debug_path}")
-                except:
-                    self.status_var.set("未识别到有效文字")
-
-        except Exception as e:
-            error_msg = f"OCR失败: {str(e)}"
-            self.status_var.set(error_msg)
-            print(error_msg)
+                    event, job = self.pipeline.results.get_nowait()
+                except queue.Empty:
+                    break
+                if event == "preview":
+                    self.preview_renderer.show(job)
+                elif event == "ocr":
+                    self._on_ocr_result(job)
+                else:
+                    job.trace.meta["error"] = job.error
+                    job.trace.finish()
+                    self.status_var.set(job.error)
+        finally:
+            self.root.after(PIPELINE_PUMP_MS, self._pump_pipeline)
+
+    def _on_ocr_result(self, job):
+        """在主线程中显示 OCR 结果并开始翻译"""
+        best_text, best_method, timings, trace = job.text, job.method, job.timings, job.trace
+        if trace.kind == "watch" and self.region_watcher is None:
+            # 监视已停止，丢弃剩余的监视帧结果
+            trace.finish()
+        elif best_text and self.region_watcher is not None and best_text == self.last_ocr_text:
+            # 监视模式下文字未变化（如仅背景动画），不重复翻译
+            self.status_var.set("👁️ 区域文字未变化 - 按F8停止监视")
+            trace.finish()
+        elif best_text:
+            self.last_ocr_text = best_text
+            self.input_text.delete("1.0", tk.END)
+            self.input_text.insert(tk.END, best_text)
+            self.status_var.set(f"识别完成（{best_method}）：{len(best_text)}字符，"
+                                f"用时 {job.elapsed * 1000:.0f}ms（{len(timings)}/{len(OCR_METHODS)} 个方案）")
+            self.translate_text(trace)
+        else:
+            trace.finish()
+            # 如果没有识别到文字，尝试保存图像用于调试
+            try:
+                debug_path = "debug_screenshot.png"
+                Image.fromarray(job.image).save(debug_path)
+                self.status_var.set(f"未识别到有效文字，已保存到 {debug_path}")
+                print(f"未识别到文字，截图已保存到: {debug_path}")
+            except:
+                self.status_var.set("未识别到有效文字")
 
     # --- 翻译核心 ---
-    def translate_text(self):
+    def translate_text(self, trace=None):
         text = self.input_text.get("1.0", tk.END).strip()
         if not text:
             self.status_var.set("请输入要翻译的文本")
             return
 
-        self.status_var.set("正在翻译...")
+        if trace is None:
+            trace = self.tracer.new_cycle("manual")
+        # 区域监视的后台请求让位于 F10 截图和手动输入
+        priority = self._request_priority(trace)
+
+        # 缓存命中则直接显示，无需请求 API（翻译服务已使仍在进行的旧请求过期，避免其结果覆盖当前内容）
+        seq, cached = self.translation_service.submit(text, priority)
+        # 手动请求仍在进行时，后台请求不占用输出框，也不显示结果
+        owns_output = not self._higher_priority_pending(priority)
+        if owns_output:
+            self._mark_displayed(seq, priority)
+        if cached is not None:
+            self._expire_pending(seq, priority)
+            trace.meta["cache_hit"] = True
+            if owns_output:
+                with trace.stage("render"):
+                    self._update_result(cached, from_cache=True)
+            else:
+                trace.meta["stale"] = True
+            trace.finish()
+            return
+
+        if owns_output:
+            self.status_var.set("正在翻译...")
+            self.output_text.delete("1.0", tk.END)
+            self.output_text.insert(tk.END, "🧠 思考中...\n")
+
+        # 输出框从此属于这个请求：旧请求的临时结果不再显示（结果经 root.after 返回，晚于这里的显示）
+        if CANCEL_STALE_REQUESTS:
+            # 被取消的旧请求不会再返回结果
+            self._expire_pending(seq, priority)
+        self.pending_traces[seq] = trace
+
+    def _show_provisional(self, seq, translation, similarity):
+        """（主线程）显示相似原文的译文，输出框已属于更新的请求时不显示"""
+        if seq != self.displayed_seq:
+            return
         self.output_text.delete("1.0", tk.END)
-        self.output_text.insert(tk.END, "🧠 思考中...\n")
+        self.output_text.insert(tk.END, f"{translation}\n\n⏳ 相似原文的译文（{similarity:.0%}），正在获取准确翻译...")
+
+    def _on_translation_done(self, seq, result, error):
+        """（事件循环线程）把结果交给主线程显示"""
+        self.root.after(0, lambda: self._show_translation(seq, result, error))
+
+    @staticmethod
+    def _request_priority(trace):
+        """区域监视的请求为后台优先级，其余（F10、保存的区域、手动输入）为手动优先级"""
+        return PRIORITY_BACKGROUND if trace is None or trace.kind == "watch" else PRIORITY_MANUAL
+
+    def _higher_priority_pending(self, priority):
+        """是否有优先级更高的请求（后台请求之于手动请求）仍在进行"""
+        return any(self._request_priority(trace) < priority for trace in self.pending_traces.values())
+
+    def _mark_displayed(self, seq, priority):
+        self.displayed_seq = seq
+        self.displayed_priority = priority
+
+    def _expire_pending(self, seq, priority):
+        """结束被更新请求取代的追踪记录（同等或更低优先级的更早请求），使其仍计入统计"""
+        for older_seq in [s for s, t in self.pending_traces.items()
+                          if s < seq and self._request_priority(t) >= priority]:
+            trace = self.pending_traces.pop(older_seq)
+            trace.meta["superseded"] = True
+            trace.finish()
+
+    def _show_translation(self, seq, result, error):
+        trace = self.pending_traces.pop(seq, None)
+        priority = self._request_priority(trace)
+        # 同等或更低优先级的更早请求已过期，不再等待其结果
+        self._expire_pending(seq, priority)
+
+        if (seq < self.displayed_seq and priority >= self.displayed_priority
+                or self._higher_priority_pending(priority)):
+            # 已有更新的结果显示，或输出框属于仍在进行的手动请求，丢弃该结果（手动请求的结果仍会覆盖后台结果）
+            if trace is not None:
+                trace.meta["stale"] = True
+                trace.finish()
+            return
+        self._mark_displayed(seq, priority)
+
+        if error is None:
+            translation, latency, similarity = result
+            if trace is not None:
+                if similarity is not None:
+                    trace.meta["tm_similarity"] = round(similarity, 3)
+                else:
+                    ttft, total_time = latency
+                    trace.add("translate", total_time)
+                    trace.meta["ttft_ms"] = round(ttft * 1000, 3)
+                with trace.stage("render"):
+                    self._update_result(translation, latency=latency, similarity=similarity)
+                trace.finish()
+            else:
+                self._update_result(translation, latency=latency, similarity=similarity)
+            return
 
-        thread = threading.Thread(target=self._translate_worker, args=(text,))
-        thread.daemon = True
-        thread.start()
+        if trace is not None:
+            trace.meta["error"] = str(error)
+            trace.finish()
 
-    def _translate_worker(self, text):
+        # ✅ 安全处理错误信息
+        error_str = str(error)
         try:
-            clean_text = text.strip()
-            if not clean_text:
-                self.root.after(0, lambda: self._update_result("❌ 输入为空"))
-                return
-
-            # ✅ 安全编码：确保所有字符串为 UTF-8
-            safe_system = SYSTEM_PROMPT.encode('utf-8', errors='replace').decode('utf-8')
-            safe_prompt = (f"{PRE_PROMPT}\n{clean_text}").encode('utf-8', errors='replace').decode('utf-8')
+            safe_error = error_str.encode('utf-8', errors='replace').decode('utf-8')
+        except:
+            safe_error = "未知错误"
+        self._update_result(f"❌ API请求失败：{safe_error}")
 
-            response = self.client.chat.completions.create(
-                model=MODEL_NAME,
-                messages=[
-                    {"role": "system", "content": safe_system},
-                    {"role": "user", "content": safe_prompt}
-                ],
-                temperature=TEMPERATURE,
-                max_tokens=1024,
-                stream=False
-            )
+    def _on_queue_depth(self, depth):
+        """（事件循环线程）更新状态栏中的队列深度"""
+        self.root.after(0, lambda: self._show_queue_depth(depth))
 
-            result = response.choices[0].message.content
-            self.root.after(0, lambda: self._update_result(result))
+    def _show_queue_depth(self, depth):
+        self.queue_depth = depth
+        if depth > 0:
+            self.status_var.set(f"正在翻译...（队列中 {depth} 个请求）")
 
-        except Exception as e:
-            # ✅ 安全处理错误信息
-            error_str = str(e)
-            try:
-                safe_error = error_str.encode('utf-8', errors='replace').decode('utf-8')
-            except:
-                safe_error = "未知错误"
-            error_msg = f"❌ API请求失败：{safe_error}"
-            self.root.after(0, lambda: self._update_result(error_msg))
+    def _show_partial_translation(self, seq, text, done, total):
+        """（主线程）显示已完成的分块译文，输出框已属于更新的请求时不显示"""
+        if seq != self.displayed_seq:
+            return
+        self.output_text.delete("1.0", tk.END)
+        self.output_text.insert(tk.END, text)
+        self.status_var.set(f"正在翻译...（已完成 {done}/{total} 段）")
 
-    def _update_result(self, result):
+    def _update_result(self, result, from_cache=False, latency=None, similarity=None):
         self.output_text.delete("1.0", tk.END)
         self.output_text.insert(tk.END, result)
-        self.status_var.set("✅ 翻译完成")
+        source = "（缓存）" if from_cache else ""
+        if similarity is not None:
+            source = f"（翻译记忆 相似{similarity:.0%}）"
+        timing = ""
+        if latency is not None:
+            self.request_latencies.append(latency)
+            ttft, total_time = latency
+            timing = f" | 首字 {ttft * 1000:.0f}ms / 总计 {total_time:.1f}s"
+        self.status_var.set(f"✅ 翻译完成{source}{timing} | {self.translation_cache.stats_text()}")
 
     def clear_all(self):
         self.input_text.delete("1.0", tk.END)
         self.output_text.delete("1.0", tk.END)
-        self.preview_label.config(image="", text="无截图")
+        self.preview_renderer.clear()
+        self.translation_context.clear()
         self.status_var.set("已清空")
 
 
-if __name__ == "__main__":
+# ==================== 离线基准测试 ====================
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.webp')
+BENCHMARK_STAGES = ("capture", "preprocess", "ocr", "translate_ttft", "translate", "total")
+
+
+def stub_reply(messages):
+    """桩服务器的“译文”：回显最后一条用户消息（去掉第一行翻译指令），保留【编号】以便批量拆分"""
+    content = messages[-1].get("content", "") if messages else ""
+    lines = content.split("\n")
+    if len(lines) > 1:
+        lines = lines[1:]
+    return "[译] " + "\n".join(lines)
+
+
+class StubChatHandler(BaseHTTPRequestHandler):
+    """OpenAI 兼容的 /chat/completions 接口，按配置的延迟返回回显译文"""
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            self.send_error(404)
+            return
+        length = int(self.headers.get('Content-Length', 0))
+        body = json.loads(self.rfile.read(length) or b'{}')
+        reply = stub_reply(body.get("messages", []))
+        model = body.get("model", MODEL_NAME)
+
+        time.sleep(self.server.latency)
+        if body.get("stream"):
+            self._send_stream(model, reply)
+        else:
+            self._send_completion(model, reply, body.get("messages", []))
+
+    def _send_completion(self, model, reply, messages):
+        prompt_tokens = sum(estimate_tokens(m.get("content", "")) for m in messages)
+        completion_tokens = estimate_tokens(reply)
+        # 非流式响应也模拟逐 token 生成的耗时
+        time.sleep(self.server.token_delay * completion_tokens)
+        payload = json.dumps({
+            "id": "stub-completion",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": reply},
+                         "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                      "total_tokens": prompt_tokens + completion_tokens}
+        }).encode('utf-8')
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _send_stream(self, model, reply):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+
+        def send_chunk(delta, finish_reason=None):
+            chunk = {
+                "id": "stub-completion",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode('utf-8'))
+            self.wfile.flush()
+
+        send_chunk({"role": "assistant", "content": ""})
+        for i in range(0, len(reply), 4):
+            send_chunk({"content": reply[i:i + 4]})
+            time.sleep(self.server.token_delay)
+        send_chunk({}, "stop")
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+        self.close_connection = True
+
+
+class StubOpenAIServer:
+    """本地 OpenAI 兼容桩服务器，用于基准测试和离线调试"""
+
+    def __init__(self, host="127.0.0.1", port=0, latency_ms=300, token_ms=10):
+        self.httpd = ThreadingHTTPServer((host, port), StubChatHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.latency = latency_ms / 1000
+        self.httpd.token_delay = token_ms / 1000
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def benchmark_translate(service, results, text):
+    """基准测试中的翻译请求（走界面同一条翻译路径），返回 (译文, 首字延迟)"""
+    seq, cached = service.submit(text)
+    if cached is not None:
+        return cached, 0.0
+    while True:
+        result_seq, result, error = results.get()
+        if result_seq != seq:
+            continue  # 被取代的旧请求
+        if error is not None:
+            raise error
+        translation, latency, _ = result
+        # 翻译记忆命中时没有请求延迟
+        return translation, latency[0] if latency is not None else 0.0
+
+
+def run_benchmark(image_dir, api_base=None, stub_latency_ms=300, stub_token_ms=10,
+                  stream=False, repeat=1, output=None):
+    """离线运行 截图→预处理→OCR→翻译 流水线，统计各阶段延迟、吞吐量和识别字符数"""
+    paths = sorted(path for path in glob.glob(os.path.join(image_dir, '*'))
+                   if path.lower().endswith(IMAGE_EXTENSIONS))
+    if not paths:
+        print(f"❌ 目录中没有截图: {image_dir}")
+        return None
+
+    stub = None
+    if api_base is None:
+        stub = StubOpenAIServer(latency_ms=stub_latency_ms, token_ms=stub_token_ms).start()
+        api_base = stub.base_url
+        print(f"✅ 已启动本地桩服务器: {api_base}（延迟 {stub_latency_ms}ms）")
+
+    # 与界面相同的翻译服务（调度器、批量、上下文、翻译记忆、多端点），缓存只在内存中，不影响正式缓存
+    results_queue = queue.Queue()
+    service = TranslationService(
+        lambda seq, result, error: results_queue.put((seq, result, error)),
+        endpoint_pool=EndpointPool([Endpoint("benchmark", api_base, API_KEY or "stub", MODEL_NAME)]),
+        cache=TranslationCache(path=':memory:'),
+        memory=TranslationMemory() if TRANSLATION_MEMORY else None, stream=stream)
+    executor = OCRExecutor(create_ocr_backend())
+    preprocessor = Preprocessor()
+    stages = {stage: [] for stage in BENCHMARK_STAGES}
+    records = []
+
+    wall_start = time.perf_counter()
+    try:
+        for _ in range(max(1, repeat)):
+            for path in paths:
+                t0 = time.perf_counter()
+                # “截图”阶段：从磁盘读取并转换为 RGB 图像
+                frame = cv2.imread(path, cv2.IMREAD_COLOR)
+                if frame is None:
+                    print(f"⚠️  无法读取截图: {path}")
+                    continue
+                image = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+                t1 = time.perf_counter()
+                processed_images = preprocessor.process(image)
+                t2 = time.perf_counter()
+                text, method, _ = executor.run(processed_images, boxes=executor.detect_lines(processed_images))
+                t3 = time.perf_counter()
+                ttft = 0.0
+                if text:
+                    _, ttft = benchmark_translate(service, results_queue, text)
+                t4 = time.perf_counter()
+
+                timings = {"capture": t1 - t0, "preprocess": t2 - t1, "ocr": t3 - t2,
+                           "translate_ttft": ttft, "translate": t4 - t3, "total": t4 - t0}
+                for stage, elapsed in timings.items():
+                    stages[stage].append(elapsed)
+                records.append({"file": os.path.basename(path), "ocr_method": method, "ocr_chars": len(text),
+                                **{f"{stage}_ms": round(elapsed * 1000, 3) for stage, elapsed in timings.items()}})
+    finally:
+        executor.shutdown()
+        if stub is not None:
+            stub.stop()
+    wall_time = time.perf_counter() - wall_start
+
+    chars = [record["ocr_chars"] for record in records]
+    results = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "image_dir": image_dir,
+        "images": len(records),
+        "api_base": api_base,
+        "stub_latency_ms": stub_latency_ms if stub is not None else None,
+        "stream": stream,
+        "ocr_backend": executor.backend.name,
+        "wall_time_s": round(wall_time, 3),
+        "throughput_images_per_s": round(len(records) / wall_time, 3) if wall_time > 0 else 0.0,
+        "ocr_chars_total": sum(chars),
+        "ocr_chars_mean": round(sum(chars) / len(chars), 2) if chars else 0.0,
+        "stages": {
+            stage: {
+                "p50_ms": round(percentile(values, 50) * 1000, 3),
+                "p95_ms": round(percentile(values, 95) * 1000, 3),
+                "p99_ms": round(percentile(values, 99) * 1000, 3),
+                "mean_ms": round(sum(values) / len(values) * 1000, 3) if values else 0.0,
+            }
+            for stage, values in stages.items()
+        },
+        "records": records,
+    }
+
+    print(f"\n📊 基准测试：{results['images']} 张截图，吞吐量 {results['throughput_images_per_s']} 张/秒，"
+          f"平均识别 {results['ocr_chars_mean']} 字符")
+    print(f"{'阶段':<16}{'p50(ms)':>12}{'p95(ms)':>12}{'p99(ms)':>12}")
+    for stage, summary in results["stages"].items():
+        print(f"{stage:<16}{summary['p50_ms']:>12.1f}{summary['p95_ms']:>12.1f}{summary['p99_ms']:>12.1f}")
+
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"✅ 结果已写入: {output}")
+    return results
+
+
+# ==================== 命令行批量翻译 ====================
+def expand_image_inputs(inputs):
+    """把目录、通配符和文件路径展开为截图文件列表（去重并保持顺序）"""
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            candidates = sorted(glob.glob(os.path.join(item, '*')))
+        elif any(ch in item for ch in '*?['):
+            candidates = sorted(glob.glob(item, recursive=True))
+        else:
+            candidates = [item]
+        paths.extend(os.path.abspath(path) for path in candidates
+                     if os.path.isfile(path) and path.lower().endswith(IMAGE_EXTENSIONS))
+    return list(dict.fromkeys(paths))
+
+
+def load_finished_files(output):
+    """读取已有的 JSONL 输出，返回已成功处理的文件集合（用于断点续跑）"""
+    finished = set()
+    if not os.path.exists(output):
+        return finished
+    with open(output, encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # 上次中断时写了一半的行
+            if not record.get("error"):
+                finished.add(record.get("file"))
+    return finished
+
+
+def run_batch(inputs, output, ocr_workers=4, concurrency=MAX_CONCURRENT_REQUESTS,
+              api_base=None, ocr_only=False, use_cache=True, profile_name=None):
+    """无界面批量处理：并行 OCR → 限制并发的翻译 → 可续跑的 JSONL 输出"""
+    paths = expand_image_inputs(inputs)
+    finished = load_finished_files(output)
+    todo = [path for path in paths if path not in finished]
+    print(f"📂 共 {len(paths)} 张截图，已完成 {len(paths) - len(todo)} 张，待处理 {len(todo)} 张")
+    if not todo:
+        return 0
+
+    backend = create_ocr_backend()
+    try:
+        print(f"✅ Tesseract OCR 版本: {backend.version()}（{backend.name}）")
+    except Exception as e:
+        print(f"❌ Tesseract OCR 不可用: {e}")
+        return 1
+
+    if not ocr_only and not API_KEY and not api_base:
+        print("❌ 错误：config.ini 中的 api_key 为空！（或使用 --api-base 指定其他服务，或 --ocr-only）")
+        return 1
+
+    ocr_executor = OCRExecutor(backend)
+    profiles = OCRProfileStore() if profile_name else None
+    profile = profiles.get(profile_name) if profiles else None
+    image_pool = ThreadPoolExecutor(max_workers=max(1, ocr_workers), thread_name_prefix="batch-ocr")
+
+    lock = threading.Lock()
+    all_done = threading.Event()
+    waiting = {}  # 原文 -> 等待该译文的记录（相同台词只请求一次）
+    seq_texts = {}  # 请求序号 -> 原文
+    counters = {"remaining": len(todo), "written": 0, "errors": 0}
+    out = open(output, 'a', encoding='utf-8')
+
+    def write_record(record):
+        # 调用方需持有 lock
+        out.write(json.dumps(record, ensure_ascii=False) + "\n")
+        out.flush()
+        counters["written"] += 1
+        counters["remaining"] -= 1
+        if record.get("error"):
+            counters["errors"] += 1
+        if counters["written"] % 50 == 0:
+            print(f"进度 {counters['written']}/{len(todo)}")
+        if counters["remaining"] == 0:
+            all_done.set()
+
+    def on_result(seq, result, error):
+        with lock:
+            text = seq_texts.pop(seq)
+            for record in waiting.pop(text, []):
+                if error is None:
+                    record["translation"] = result[0]
+                else:
+                    record["error"] = f"API请求失败：{error}"
+                write_record(record)
+
+    # 与界面相同的翻译服务（多端点、分块、批量、截断重试、缓存），但各帧乱序完成，不附带上下文；
+    # 请求互不取消，也不丢弃：队列不设上限，由限流与重试保证在配额内完成。--no-cache 时只在内存中去重
+    service = None
+    if not ocr_only:
+        endpoint_pool = None
+        if api_base:
+            endpoint_pool = EndpointPool([Endpoint("batch", api_base, API_KEY or "stub", MODEL_NAME)])
+        service = TranslationService(
+            on_result, endpoint_pool=endpoint_pool,
+            cache=TranslationCache() if use_cache else TranslationCache(path=':memory:'),
+            context=TranslationContext(max_pairs=0), stream=False, cancel_stale=False,
+            max_concurrency=concurrency, max_queue=None)
+
+    local = threading.local()
+
+    def recognize(path):
+        # 每个识别线程复用自己的预处理缓冲区
+        if not hasattr(local, "preprocessor"):
+            local.preprocessor = Preprocessor()
+        image = Image.open(path).convert("RGB")
+        processed_images = local.preprocessor.process(image)
+        methods = profile.ordered_methods() if profile else OCR_METHODS
+        text, method, timings = ocr_executor.run(processed_images, methods=methods,
+                                                 boxes=ocr_executor.detect_lines(processed_images))
+        if profile and method:
+            profiles.record(profile, method, timings)
+        return text, method
+
+    start = time.perf_counter()
+    futures = {image_pool.submit(recognize, path): path for path in todo}
+    try:
+        for future in as_completed(futures):
+            path = futures[future]
+            record = {"file": path, "ocr_text": "", "ocr_method": "", "translation": ""}
+            try:
+                record["ocr_text"], record["ocr_method"] = future.result()
+            except Exception as e:
+                record["error"] = f"OCR失败: {e}"
+
+            text = record["ocr_text"]
+            with lock:
+                if record.get("error") or not text or ocr_only:
+                    write_record(record)
+                elif text in waiting:
+                    waiting[text].append(record)
+                else:
+                    seq, cached = service.submit(text)
+                    if cached is not None:
+                        record["translation"] = cached
+                        write_record(record)
+                    else:
+                        waiting[text] = [record]
+                        seq_texts[seq] = text
+
+        all_done.wait()
+    finally:
+        for future in futures:
+            future.cancel()
+        image_pool.shutdown(wait=False)
+        ocr_executor.shutdown()
+        out.close()
+        if service is not None:
+            service.scheduler.close()
+            service.cache.close()
+        if profiles is not None:
+            profiles.save()
+
+    elapsed = time.perf_counter() - start
+    print(f"✅ 完成 {counters['written']} 张（失败 {counters['errors']} 张），用时 {elapsed:.1f}s，"
+          f"结果写入 {output}")
+    return 1 if counters["errors"] else 0
+
+
+# ==================== OCR 方案调优 ====================
+def run_tune(inputs, profile_name=OCR_PROFILE, output=None):
+    """离线调优：对样本截图逐一运行所有方案，按得分和耗时排名，结果写入配置档
+
+    样本旁有同名 .txt 文件（如 shot1.png / shot1.txt）时以其为标准答案计算文字相似度，
+    否则以置信度评分为准。
+    """
+    import difflib
+
+    paths = expand_image_inputs(inputs)
+    if not paths:
+        print("❌ 没有找到样本截图")
+        return 1
+
+    executor = OCRExecutor(create_ocr_backend())
+    preprocessor = Preprocessor()
+    store = OCRProfileStore()
+    per_method = {name: {"scores": [], "seconds": [], "wins": 0} for name, _, _ in OCR_METHODS}
+    try:
+        for path in paths:
+            image = Image.open(path).convert("RGB")
+            processed_images = preprocessor.process(image)
+            boxes = executor.detect_lines(processed_images)
+            truth_path = os.path.splitext(path)[0] + ".txt"
+            truth = None
+            if os.path.exists(truth_path):
+                with open(truth_path, 'r', encoding='utf-8') as f:
+                    truth = ' '.join(f.read().split())
+
+            scores = {}
+            for method in OCR_METHODS:
+                try:
+                    text, confidence, elapsed = executor.evaluate(method, processed_images, boxes)
+                except Exception as e:
+                    print(f"方法 {method[0]} 失败: {e}")
+                    continue
+                if truth is not None:
+                    score = difflib.SequenceMatcher(None, text, truth).ratio() * 100
+                else:
+                    score = executor.score(text, confidence)
+                scores[method[0]] = score
+                per_method[method[0]]["scores"].append(score)
+                per_method[method[0]]["seconds"].append(elapsed)
+            if scores:
+                winner = max(scores, key=scores.get)
+                per_method[winner]["wins"] += 1
+                print(f"{os.path.basename(path)}: 最佳 {winner}（得分 {scores[winner]:.0f}）")
+    finally:
+        executor.shutdown()
+
+    ranking = sorted(
+        (name for name in per_method if per_method[name]["scores"]),
+        key=lambda name: (-per_method[name]["wins"], -sum(per_method[name]["scores"]) / len(per_method[name]["scores"]),
+                          sum(per_method[name]["seconds"])))
+    print(f"\n📊 方案排名（{len(paths)} 张样本，配置档 {profile_name}）")
+    print(f"{'方案':<20}{'胜出':>6}{'平均得分':>10}{'平均(ms)':>10}")
+    results = []
+    for name in ranking:
+        entry = per_method[name]
+        mean_score = sum(entry["scores"]) / len(entry["scores"])
+        mean_ms = sum(entry["seconds"]) / len(entry["seconds"]) * 1000
+        print(f"{name:<20}{entry['wins']:>6}{mean_score:>10.1f}{mean_ms:>10.0f}")
+        results.append({"method": name, "wins": entry["wins"], "mean_score": round(mean_score, 2),
+                        "mean_ms": round(mean_ms, 3)})
+
+    # 以调优结果覆盖配置档统计
+    store.replace(profile_name, {name: {"runs": len(per_method[name]["seconds"]), "wins": per_method[name]["wins"],
+                                        "seconds": sum(per_method[name]["seconds"])}
+                                 for name in ranking})
+    print(f"✅ 已写入配置档 {profile_name}: {store.path}")
+
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump({"profile": profile_name, "samples": len(paths), "ranking": results}, f,
+                      ensure_ascii=False, indent=2)
+    return 0
+
+
+# ==================== 启动耗时测试 ====================
+STARTUP_MODULES = ("numpy", "cv2", "PIL.Image", "PIL.ImageTk", "mss", "pytesseract", "openai")
+
+
+def _time_subprocess(args):
+    """在全新的子进程中运行并计时（秒）"""
+    start = time.perf_counter()
+    subprocess.run(args, check=True, capture_output=True)
+    return time.perf_counter() - start
+
+
+def run_startup_benchmark(repeat=5, output=None):
+    """测量冷启动耗时：各重型模块的导入时间、本脚本的导入时间和窗口出现所需时间（取中位数）"""
+    script = os.path.abspath(__file__)
+
+    def median_time(args):
+        return percentile([_time_subprocess(args) for _ in range(max(1, repeat))], 50)
+
+    interpreter = median_time([sys.executable, "-c", "pass"])
+    results = {"interpreter_ms": round(interpreter * 1000, 1), "modules_ms": {}}
+    for module in STARTUP_MODULES:
+        try:
+            elapsed = median_time([sys.executable, "-c", f"import {module}"]) - interpreter
+            results["modules_ms"][module] = round(elapsed * 1000, 1)
+        except subprocess.CalledProcessError:
+            results["modules_ms"][module] = None
+
+    load_script = ("import importlib.util, sys; "
+                   f"spec = importlib.util.spec_from_file_location('gta', {script!r}); "
+                   "module = importlib.util.module_from_spec(spec); spec.loader.exec_module(module)")
+    results["script_import_ms"] = round((median_time([sys.executable, "-c", load_script]) - interpreter) * 1000, 1)
+    try:
+        results["window_ready_ms"] = round(median_time([sys.executable, script, "--startup-probe"]) * 1000, 1)
+    except subprocess.CalledProcessError:
+        # 没有图形界面环境时无法测量
+        results["window_ready_ms"] = None
+
+    print(f"🚀 启动耗时（{repeat} 次取中位数）")
+    print(f"  Python 解释器: {results['interpreter_ms']}ms")
+    for module, elapsed in results["modules_ms"].items():
+        print(f"  import {module:<14}{'未安装' if elapsed is None else f'{elapsed}ms'}")
+    print(f"  导入本脚本: {results['script_import_ms']}ms")
+    window_ready = results["window_ready_ms"]
+    print(f"  窗口出现: {'无法测量' if window_ready is None else f'{window_ready}ms'}")
+
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="🎮 游戏翻译助手")
+    # 启动耗时测试使用：窗口显示后立即退出
+    parser.add_argument("--startup-probe", action="store_true", help=argparse.SUPPRESS)
+    subparsers = parser.add_subparsers(dest="command")
+
+    startup_parser = subparsers.add_parser("startup-benchmark", help="测量冷启动耗时")
+    startup_parser.add_argument("--repeat", type=int, default=5)
+    startup_parser.add_argument("--output", help="结果 JSON 文件路径")
+
+    bench_parser = subparsers.add_parser("benchmark", help="离线基准测试（截图目录 + 本地桩服务器）")
+    bench_parser.add_argument("image_dir", help="保存的游戏截图目录")
+    bench_parser.add_argument("--api-base", help="使用已有的 OpenAI 兼容服务，而不是内置桩服务器")
+    bench_parser.add_argument("--stub-latency-ms", type=int, default=300, help="桩服务器首字延迟")
+    bench_parser.add_argument("--stub-token-ms", type=int, default=10, help="桩服务器每个 token 的延迟")
+    bench_parser.add_argument("--stream", action="store_true", help="使用流式请求")
+    bench_parser.add_argument("--repeat", type=int, default=1, help="重复次数")
+    bench_parser.add_argument("--output", help="结果 JSON 文件路径")
+
+    batch_parser = subparsers.add_parser("batch", help="无界面批量翻译截图目录或视频帧")
+    batch_parser.add_argument("inputs", nargs="+", help="截图目录、文件或通配符（如 'frames/**/*.png'）")
+    batch_parser.add_argument("-o", "--output", default="translations.jsonl",
+                              help="JSONL 输出文件，已存在时跳过已完成的截图")
+    batch_parser.add_argument("--ocr-workers", type=int, default=4, help="同时识别的截图数")
+    batch_parser.add_argument("--concurrency", type=int, default=MAX_CONCURRENT_REQUESTS, help="翻译请求并发数")
+    batch_parser.add_argument("--api-base", help="覆盖 config.ini 中的 api_address")
+    batch_parser.add_argument("--ocr-only", action="store_true", help="只识别文字，不翻译")
+    batch_parser.add_argument("--no-cache", action="store_true", help="不使用翻译缓存")
+    batch_parser.add_argument("--profile", help="使用并更新指定的 OCR 配置档")
+
+    tune_parser = subparsers.add_parser("tune", help="用样本截图离线调优 OCR 配置档")
+    tune_parser.add_argument("inputs", nargs="+", help="样本截图目录、文件或通配符（同名 .txt 为标准答案，可选）")
+    tune_parser.add_argument("--profile", default=OCR_PROFILE, help="写入的配置档名称（默认取 config.ini 的 ocr_profile）")
+    tune_parser.add_argument("--output", help="排名结果 JSON 文件路径")
+
+    stub_parser = subparsers.add_parser("stub-server", help="启动本地 OpenAI 兼容桩服务器")
+    stub_parser.add_argument("--port", type=int, default=8765)
+    stub_parser.add_argument("--latency-ms", type=int, default=300)
+    stub_parser.add_argument("--token-ms", type=int, default=10)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "benchmark":
+        run_benchmark(args.image_dir, api_base=args.api_base, stub_latency_ms=args.stub_latency_ms,
+                      stub_token_ms=args.stub_token_ms, stream=args.stream, repeat=args.repeat,
+                      output=args.output)
+        return
+
+    if args.command == "startup-benchmark":
+        run_startup_benchmark(args.repeat, args.output)
+        return
+
+    if args.command == "batch":
+        sys.exit(run_batch(args.inputs, args.output, ocr_workers=args.ocr_workers, concurrency=args.concurrency,
+                           api_base=args.api_base, ocr_only=args.ocr_only, use_cache=not args.no_cache,
+                           profile_name=args.profile))
+
+    if args.command == "tune":
+        sys.exit(run_tune(args.inputs, args.profile, args.output))
+
+    if args.command == "stub-server":
+        server = StubOpenAIServer(port=args.port, latency_ms=args.latency_ms, token_ms=args.token_ms)
+        print(f"✅ 桩服务器运行中: {server.base_url}（Ctrl+C 退出）")
+        try:
+            server.httpd.serve_forever()
+        except KeyboardInterrupt:
+            server.httpd.server_close()
+        return
+
     app = GameTranslationAssistant()
-    app.root.mainloop()
\ No newline at end of file
+    if args.startup_probe:
+        app.root.update()
+        print("STARTUP_READY", flush=True)
+        # 不等待后台预热线程
+        os._exit(0)
+    app.root.mainloop()
+    app.ocr_profiles.save()
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
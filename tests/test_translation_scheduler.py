@@ -0,0 +1,106 @@
+import importlib.util
+import os
+import queue
+import threading
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TIMEOUT = 5
+
+
+def load_app():
+    spec = importlib.util.spec_from_file_location("game_translator", os.path.join(ROOT, "main0.4.2.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+app = load_app()
+
+
+class TranslationSchedulerTest(unittest.TestCase):
+    def setUp(self):
+        self.started = queue.Queue()
+        self.results = queue.Queue()
+        # 请求开始后阻塞，直到测试放行
+        self.release = threading.Event()
+        self.scheduler = None
+
+    def tearDown(self):
+        self.release.set()
+        if self.scheduler is not None:
+            self.scheduler.close()
+
+    def make_scheduler(self, **kwargs):
+        async def translate(text, seq):
+            self.started.put(seq)
+            await self.scheduler.loop.run_in_executor(None, self.release.wait)
+            return text
+
+        def on_result(seq, result, error):
+            self.results.put((seq, result, error))
+
+        options = dict(max_concurrency=2, cancel_stale=True, limiter=app.RateLimiter(0, 0), max_retries=0)
+        options.update(kwargs)
+        self.scheduler = app.TranslationScheduler(translate, on_result, **options)
+        return self.scheduler
+
+    def wait_started(self):
+        return self.started.get(timeout=TIMEOUT)
+
+    def collect_results(self, count):
+        results = [self.results.get(timeout=TIMEOUT) for _ in range(count)]
+        self.scheduler.close()
+        self.scheduler = None
+        # 被取消的请求不会再返回结果
+        self.assertTrue(self.results.empty())
+        return results
+
+    def test_background_request_does_not_cancel_manual(self):
+        scheduler = self.make_scheduler()
+        scheduler.submit("manual text", app.PRIORITY_MANUAL)
+        self.wait_started()
+        scheduler.submit("watch text", app.PRIORITY_BACKGROUND)
+        self.wait_started()
+        self.release.set()
+        self.assertEqual(sorted(self.collect_results(2)), [(1, "manual text", None), (2, "watch text", None)])
+
+    def test_newer_request_cancels_older_of_same_priority(self):
+        scheduler = self.make_scheduler()
+        scheduler.submit("old watch", app.PRIORITY_BACKGROUND)
+        self.wait_started()
+        scheduler.submit("new watch", app.PRIORITY_BACKGROUND)
+        self.wait_started()
+        self.release.set()
+        self.assertEqual(self.collect_results(1), [(2, "new watch", None)])
+
+    def test_manual_request_cancels_background(self):
+        scheduler = self.make_scheduler()
+        scheduler.submit("watch text", app.PRIORITY_BACKGROUND)
+        self.wait_started()
+        scheduler.submit("manual text", app.PRIORITY_MANUAL)
+        self.wait_started()
+        self.release.set()
+        self.assertEqual(self.collect_results(1), [(2, "manual text", None)])
+
+    def test_waiting_requests_are_merged_into_one_batch(self):
+        batches = []
+
+        async def translate_many(texts, seqs):
+            batches.append(texts)
+            return texts
+
+        # 窗口足够长，凑满 batch_max_segments 时立即发送
+        scheduler = self.make_scheduler(cancel_stale=False, limiter=app.RateLimiter(60, 0),
+                                        translate_many=translate_many, batch_window_ms=10000, batch_max_segments=3)
+        for text in ("first", "second", "third"):
+            scheduler.submit(text)
+        self.assertEqual(sorted(self.collect_results(3)),
+                         [(1, "first", None), (2, "second", None), (3, "third", None)])
+        self.assertEqual(batches, [["first", "second", "third"]])
+        # 一批只占用一次请求配额
+        self.assertEqual(round(scheduler.limiter.requests.tokens), 59)
+
+
+if __name__ == "__main__":
+    unittest.main()